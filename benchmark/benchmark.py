@@ -0,0 +1,265 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Status Bot Benchmark
+# Purpose: Measure probe, icon and tracker performance against local fake servers.
+# Date: 18OCTOBER2026
+#
+# Usage: python benchmark.py [--tracked 500] [--output results.json] [--compare baseline.json]
+#--------------------------------------------------------------------
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "code"))
+
+import dispatch_library as d
+import fake_servers as f
+import history_library as h
+import status_library as s
+import modules.StatusBot.cog as status_cog
+import modules.StatusTracker.cog as tracker_cog
+
+DEFAULT_ICON = os.path.join(HERE, "..", "server-icons", "default-64.png")
+
+def percentile(values: list, p: float) -> float:
+    # Nearest-rank percentile of an already sorted list.
+    if values == []:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+def summarize(name: str, latencies: list, wall: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "name": name,
+        "ops": len(latencies),
+        "p50": percentile(latencies, 50) * 1000,
+        "p90": percentile(latencies, 90) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "max": latencies[-1] * 1000 if latencies != [] else 0.0,
+        "throughput": len(latencies) / wall if wall > 0 else 0.0,
+    }
+
+async def measure(name: str, calls: list, concurrency: int) -> dict:
+    """Runs the calls, at most concurrency at once, timing each one and the whole batch."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(call):
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed(call) for call in calls])
+    return summarize(name, latencies, time.perf_counter() - start)
+
+class FakeMessage:
+    # A tracked message, edits take edit_latency seconds like a Discord round trip would.
+    def __init__(self, message_id: int, channel, edit_latency: float) -> None:
+        self.id = message_id
+        self.channel = channel
+        self.edit_latency = edit_latency
+        self.edits = 0
+
+    async def edit(self, **kwargs) -> None:
+        await asyncio.sleep(self.edit_latency)
+        self.edits += 1
+
+class FakeChannel:
+    def __init__(self, channel_id: int, edit_latency: float) -> None:
+        self.id = channel_id
+        self.edit_latency = edit_latency
+        self.messages = {}
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        if message_id not in self.messages:
+            self.messages[message_id] = FakeMessage(message_id, self, self.edit_latency)
+        return self.messages[message_id]
+
+class FakeBot:
+    """
+    Purpose:
+        Stands in for StatusBot, with the real status library caches and a mocked Discord client.
+    Pre-Conditions:
+        :param path: Folder for the bot's log and tracker registry.
+        :param edit_latency: Seconds every message edit takes.
+        :param edit_rate: Edits per second per channel the dispatcher allows, 0 for no limit.
+    """
+    def __init__(self, path: str, edit_latency: float, edit_rate: float = 0) -> None:
+        self.path = path
+        self.name = "benchmark"
+        self.user = "benchmark"
+        self.shard_ids = None
+        self.shard_count = 1
+        self.handoff = {}
+        self.channels = {}
+        self.edit_latency = edit_latency
+
+        self.resolver = s.Resolver()
+        self.protocol_profiles = s.ProtocolProfiles()
+        self.status_cache = s.StatusCache(probe=functools.partial(s.probe_server, resolver=self.resolver), profiles=self.protocol_profiles)
+        self.icon_cache = s.IconCache(DEFAULT_ICON)
+        self.history = h.History()
+        self.dispatcher = d.EditDispatcher(rate=edit_rate)
+
+    def get_channel(self, channel_id: int) -> FakeChannel:
+        return self.get_partial_messageable(channel_id)
+
+    def get_partial_messageable(self, channel_id: int) -> FakeChannel:
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(channel_id, self.edit_latency)
+        return self.channels[channel_id]
+
+    def log(self, channel, author, content) -> None:
+        pass
+
+    def get_cog(self, name: str):
+        return None
+
+async def start_servers(args) -> tuple:
+    """Starts the fake servers, returns them and the addresses to probe."""
+    servers = []
+    addresses = []
+    for i in range(args.java):
+        server = f.FakeJavaServer(players=args.players, favicon_size=args.favicon, mods=args.mods, latency=args.latency, query=i % 2 == 0)
+        addresses.append(f"{f.HOST}:{await server.start()}")
+        servers.append(server)
+    for i in range(args.bedrock):
+        server = f.FakeBedrockServer(players=args.players, latency=args.latency)
+        addresses.append(f"{f.HOST}:{await server.start()}")
+        servers.append(server)
+    for i in range(args.dead):
+        # Half the dead hosts refuse connections, the other half never answer.
+        if i % 2 == 0:
+            addresses.append(f"{f.HOST}:{f.free_port()}")
+        else:
+            server = f.FakeSilentHost()
+            addresses.append(f"{f.HOST}:{await server.start()}")
+            servers.append(server)
+    return (servers, addresses)
+
+async def run(args) -> dict:
+    (servers, addresses) = await start_servers(args)
+    path = tempfile.mkdtemp(prefix="status_bot_bench_") + "/"
+    bot = FakeBot(path, args.edit_latency, args.edit_rate)
+    results = []
+
+    # server_status, every call a cache miss, then every call a hit.
+    cog = status_cog.StatusBot(bot)
+    def cold(address):
+        bot.status_cache.invalidate(address)
+        return cog.server_status(address)
+    for i in range(args.rounds):
+        results.append(await measure(f"server_status miss #{i + 1}", [functools.partial(cold, address) for address in addresses], args.concurrency))
+    results.append(await measure("server_status hit", [functools.partial(cog.server_status, address) for address in addresses * args.rounds], args.concurrency))
+
+    # decode_icon, new favicons, then one already decoded.
+    favicons = [f.make_favicon(args.favicon) for i in range(args.icons)]
+    results.append(await measure("decode_icon miss", [functools.partial(cog.decode_icon, icon) for icon in favicons], 1))
+    results.append(await measure("decode_icon hit", [functools.partial(cog.decode_icon, favicons[0]) for i in range(args.icons)], 1))
+
+    # A StatusTracker refresh of every tracked message, with probes, then with nothing changed.
+    tracker_cog.path = path
+    tracker = tracker_cog.StatusTracker(bot)
+    tracker.task.cancel()
+    for i in range(args.tracked):
+        tracker.schedule.add(tracker.store.add(1000 + i % args.channels, i + 1, addresses[i % len(addresses)], 1))
+    rows = list(tracker.schedule)
+
+    def cycle(changed: bool):
+        async def call():
+            if changed:
+                for address in addresses:
+                    bot.status_cache.invalidate(address)
+                tracker.fingerprints.clear()
+            await tracker.refresh(list(rows))
+        return call
+    cycles = [
+        await measure("tracker cycle changed", [cycle(True) for i in range(args.cycles)], 1),
+        await measure("tracker cycle unchanged", [cycle(False) for i in range(args.cycles)], 1),
+    ]
+    for result in cycles:
+        result["messages_per_second"] = result["throughput"] * len(rows)
+    results += cycles
+    tracker.cog_unload()
+
+    for server in servers:
+        server.close()
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "time": time.time(),
+        "config": vars(args).copy(),
+        "results": results,
+    }
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def report(run: dict, baseline: dict | None = None) -> None:
+    print(f"\nBenchmark at {run['commit']} on Python {run['python']}")
+    print(f"{'benchmark':<28}{'ops':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ops/s':>11}")
+    previous = {result["name"]: result for result in baseline["results"]} if baseline != None else {}
+    for result in run["results"]:
+        line = f"{result['name']:<28}{result['ops']:>7}{result['p50']:>10.2f}{result['p90']:>10.2f}{result['p99']:>10.2f}{result['max']:>10.2f}{result['throughput']:>11.1f}"
+        if "messages_per_second" in result:
+            line += f"  ({result['messages_per_second']:.0f} messages/s)"
+        old = previous.get(result["name"])
+        if old != None and old["p50"] > 0 and old["throughput"] > 0:
+            line += f"  p50 {(result['p50'] / old['p50'] - 1) * 100:+.1f}%, ops/s {(result['throughput'] / old['throughput'] - 1) * 100:+.1f}%"
+        print(line)
+    if baseline != None:
+        print(f"Compared with {baseline['commit']}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the status bot against local fake Minecraft servers.")
+    parser.add_argument("--java", type=int, default=20, help="Java servers, every other one also answers queries")
+    parser.add_argument("--bedrock", type=int, default=10, help="Bedrock servers")
+    parser.add_argument("--dead", type=int, default=4, help="Dead hosts, half refusing and half silent")
+    parser.add_argument("--players", type=int, default=10, help="Players online on every server")
+    parser.add_argument("--favicon", type=int, default=4096, help="Favicon size in bytes, 0 for none")
+    parser.add_argument("--mods", type=int, default=0, help="Mods in every Java server's mod list")
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds every fake server waits before answering")
+    parser.add_argument("--edit-latency", type=float, default=0.02, help="Seconds every mocked Discord edit takes")
+    parser.add_argument("--edit-rate", type=float, default=0, help="Edits per second per channel the dispatcher allows, 0 for no limit")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent server_status calls")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds of server_status calls")
+    parser.add_argument("--icons", type=int, default=200, help="decode_icon calls")
+    parser.add_argument("--tracked", type=int, default=500, help="Tracked messages")
+    parser.add_argument("--channels", type=int, default=20, help="Channels the tracked messages are spread over")
+    parser.add_argument("--cycles", type=int, default=5, help="Tracker cycles per benchmark")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against results written by an earlier --output")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare != None:
+        with open(args.compare) as json_file:
+            baseline = json.load(json_file)
+            json_file.close()
+    report(results, baseline)
+
+    if args.output != None:
+        with open(args.output, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+            json_file.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Status Bot Benchmark
+# Purpose: Local stand-in Minecraft servers for the benchmark harness.
+# Date: 18OCTOBER2026
+#--------------------------------------------------------------------
+
+import asyncio
+import base64
+import json
+import os
+import socket
+import struct
+import zlib
+
+HOST = "127.0.0.1"
+
+# The RakNet "offline message" magic every unconnected ping and pong carries.
+RAKNET_MAGIC = bytes.fromhex("00ffff00fefefefefdfdfdfd12345678")
+
+def free_port() -> int:
+    # A port nothing is listening on, for TCP and UDP alike.
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+def write_varint(value: int) -> bytes:
+    out = b""
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value != 0:
+            out += bytes([byte | 0x80])
+        else:
+            return out + bytes([byte])
+
+async def read_varint(reader: asyncio.StreamReader) -> int:
+    value = 0
+    for i in range(5):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7f) << (7 * i)
+        if not byte & 0x80:
+            return value
+    raise IOError("VarInt too big")
+
+def make_favicon(size: int) -> str | None:
+    """Returns a "data:image/png;base64," favicon of about size bytes, None for size 0."""
+    if size <= 0:
+        return None
+    # A valid PNG header and IHDR chunk, padded out with random IDAT bytes.
+    ihdr = struct.pack(">IIBBBBB", 64, 64, 8, 6, 0, 0, 0)
+    header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    data = os.urandom(max(0, size - len(header) - 24))
+    png = header + struct.pack(">I", len(data)) + b"IDAT" + data + struct.pack(">I", zlib.crc32(b"IDAT" + data))
+    png += struct.pack(">I", 0) + b"IEND" + struct.pack(">I", zlib.crc32(b"IEND"))
+    return "data:image/png;base64," + base64.b64encode(png).decode()
+
+class FakeJavaServer:
+    """
+    Purpose:
+        A Java Edition server answering the TCP status/ping handshake, and optionally
+        the GS4 query protocol over UDP on the same port.
+    Pre-Conditions:
+        :param players: Players online, also the names the query lists.
+        :param favicon_size: Approximate favicon size in bytes, 0 to send none.
+        :param mods: Number of entries in the Forge mod list, 0 to send none.
+        :param latency: Seconds to wait before every response.
+        :param query: Whether to answer GS4 queries.
+    """
+    def __init__(self, players: int = 5, favicon_size: int = 4096, mods: int = 0, latency: float = 0.0, query: bool = True) -> None:
+        self.latency = latency
+        self.query = query
+        self.names = [f"Player{i}" for i in range(players)]
+        self.port = None
+        self.requests = 0
+
+        status = {
+            "version": {"name": "1.19.2", "protocol": 760},
+            "players": {"online": players, "max": 100, "sample": [{"name": name, "id": "00000000-0000-0000-0000-000000000000"} for name in self.names[:12]]},
+            "description": "§aA Benchmark Server",
+        }
+        favicon = make_favicon(favicon_size)
+        if favicon != None:
+            status["favicon"] = favicon
+        if mods > 0:
+            status["modinfo"] = {"type": "FML", "modList": [{"modid": f"mod{i}", "version": "1.0.0"} for i in range(mods)]}
+        payload = json.dumps(status).encode()
+        packet = write_varint(0) + write_varint(len(payload)) + payload
+        self.status_packet = write_varint(len(packet)) + packet
+
+    async def start(self, port: int | None = None) -> int:
+        self.server = await asyncio.start_server(self.handle, HOST, port or 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.query:
+            (self.transport, _) = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: FakeQueryProtocol(self), local_addr=(HOST, self.port)
+            )
+        return self.port
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # Handshake, then the status request.
+            await reader.readexactly(await read_varint(reader))
+            await reader.readexactly(await read_varint(reader))
+            self.requests += 1
+            if self.latency > 0:
+                await asyncio.sleep(self.latency)
+            writer.write(self.status_packet)
+            await writer.drain()
+
+            # Ping, answered with the same payload.
+            ping = await reader.readexactly(await read_varint(reader))
+            writer.write(write_varint(len(ping)) + ping)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, IOError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self) -> None:
+        self.server.close()
+        if self.query:
+            self.transport.close()
+
+class FakeQueryProtocol(asyncio.DatagramProtocol):
+    # The GS4 query protocol, handshake then full stat.
+    def __init__(self, server: FakeJavaServer) -> None:
+        self.server = server
+        self.challenge = b"9513307"
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if data[:2] != b"\xfe\xfd" or len(data) < 7:
+            return
+        session = data[3:7]
+        if data[2] == 9:
+            response = b"\x09" + session + self.challenge + b"\x00"
+        else:
+            info = {
+                "hostname": "A Benchmark Server", "gametype": "SMP", "game_id": "MINECRAFT", "version": "1.19.2",
+                "plugins": "Paper on 1.19.2: WorldEdit 7.2; Essentials 2.19", "map": "world",
+                "numplayers": str(len(self.server.names)), "maxplayers": "100", "hostport": str(self.server.port), "hostip": HOST,
+            }
+            response = b"\x00" + session + b"splitnum\x00\x80\x00"
+            response += b"".join(key.encode() + b"\x00" + value.encode() + b"\x00" for (key, value) in info.items())
+            response += b"\x00\x01player_\x00\x00" + b"".join(name.encode() + b"\x00" for name in self.server.names) + b"\x00"
+        self.server.requests += 1
+        asyncio.get_running_loop().call_later(self.server.latency, self.transport.sendto, response, addr)
+
+class FakeBedrockServer(asyncio.DatagramProtocol):
+    """
+    Purpose:
+        A Bedrock Edition server answering RakNet unconnected pings with a pong.
+    Pre-Conditions:
+        :param players: Players online.
+        :param latency: Seconds to wait before every response.
+    """
+    def __init__(self, players: int = 5, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.port = None
+        self.requests = 0
+        self.motd = f"MCPE;A Benchmark Server;545;1.19.21;{players};100;1234567890;Bedrock level;Survival;1;".encode()
+
+    async def start(self, port: int | None = None) -> int:
+        (self.transport, _) = await asyncio.get_running_loop().create_datagram_endpoint(lambda: self, local_addr=(HOST, port or 0))
+        self.port = self.transport.get_extra_info("sockname")[1]
+        return self.port
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if len(data) < 9 or data[0] != 0x01:
+            return
+        self.requests += 1
+        response = b"\x1c" + data[1:9] + struct.pack(">Q", 0x1234) + RAKNET_MAGIC + struct.pack(">H", len(self.motd)) + self.motd
+        asyncio.get_running_loop().call_later(self.latency, self.transport.sendto, response, addr)
+
+    def close(self) -> None:
+        self.transport.close()
+
+class FakeSilentHost(asyncio.DatagramProtocol):
+    """
+    Purpose:
+        A dead host that accepts TCP connections and UDP packets but never answers,
+        so every probe runs into its timeout. A port from free_port() is the refused kind.
+    """
+    async def start(self, port: int | None = None) -> int:
+        self.connections = []
+        self.server = await asyncio.start_server(self.handle, HOST, port or 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        (self.transport, _) = await asyncio.get_running_loop().create_datagram_endpoint(lambda: self, local_addr=(HOST, self.port))
+        return self.port
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections.append(writer)
+        try:
+            await reader.read()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        writer.close()
+
+    def close(self) -> None:
+        self.server.close()
+        self.transport.close()
+        for writer in self.connections:
+            writer.close()
@@ -6,12 +6,126 @@
 # Date: 10AUGUST2021
 # Updated: 3AUGUST2022 - p0t4t0sandwich
 #   - Added the linking database logic to be shared between bots.
+# Updated: 18OCTOBER2026
+#   - Moved logging onto a batched background writer with rotation.
+#   - Pooled the linking database connections and added async_link_account.
+#   - Cached Twitch app tokens and user ids in TwitchClient.
 #--------------------------------------------------------------------
 
+import asyncio
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+# Defaults for log rotation, the log is rotated once it grows past LOG_MAX_BYTES.
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+
+# The most lines the log writer takes off the queue per write.
+LOG_BATCH = 256
+
+class BotLogger:
+    """
+    Purpose:
+        Queues log lines and writes them to <path><bot>.log in batches from a background thread,
+        so logging never blocks the event loop.
+    Pre-Conditions:
+        :param path: Filepath of where to save the log file.
+        :param bot: The name of the bot using the logger.
+        :param max_bytes: Size in bytes at which the log is rotated, 0 to never rotate.
+        :param backups: The number of rotated logs to keep, as <bot>.log.1 to <bot>.log.<backups>.
+    Post-Conditions:
+        Queued lines are flushed when close() is called, or when the interpreter exits.
+    """
+    def __init__(self, path: str, bot: str, max_bytes: int = LOG_MAX_BYTES, backups: int = LOG_BACKUPS) -> None:
+        self.path = path
+        self.bot = bot
+        self.filename = path + bot + ".log"
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name=f"{bot}-logger", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def log(self, string: str) -> None:
+        now = str(datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
+        self.queue.put("[" + now + "]: [" + self.bot + " Log] " + string)
+
+    def close(self, timeout: float = 5) -> None:
+        # Flushes everything queued so far and stops the writer thread.
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def _rotate(self, file):
+        file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.filename}.{i}"):
+                os.replace(f"{self.filename}.{i}", f"{self.filename}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.filename, self.filename + ".1")
+        else:
+            os.remove(self.filename)
+        return open(self.filename, "a")
+
+    def _run(self) -> None:
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        file = open(self.filename, "a")
+
+        running = True
+        while running:
+            lines = [self.queue.get()]
+            # Drain whatever else is queued, so it's written as one batch.
+            while len(lines) < LOG_BATCH:
+                try:
+                    lines.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in lines:
+                running = False
+                lines = [line for line in lines if line != None]
+            if lines == []:
+                continue
+
+            text = "\n".join(lines) + "\n"
+            print(text, end="", flush=True)
+            try:
+                if self.max_bytes > 0 and file.tell() > 0 and file.tell() + len(text) > self.max_bytes:
+                    file = self._rotate(file)
+                file.write(text)
+                file.flush()
+            except OSError as err:
+                print(f"[{self.bot} Log] Failed to write {self.filename}: {err}", flush=True)
+        file.close()
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+def get_logger(path: str, bot: str, **kwargs) -> BotLogger:
+    """
+    Purpose:
+        Returns the shared BotLogger for a bot, creating it on first use.
+    Pre-Conditions:
+        :param path: Filepath of where to save the log file.
+        :param bot: The name of the bot using the logger.
+        :param kwargs: Rotation settings passed to BotLogger when it's created.
+    Return:
+        The BotLogger writing to <path><bot>.log.
+    """
+    with _loggers_lock:
+        if (path, bot) not in _loggers:
+            _loggers[(path, bot)] = BotLogger(path, bot, **kwargs)
+        return _loggers[(path, bot)]
+
 # Function for simple logging
 def bot_logger(path, bot, string):
-    from datetime import datetime
-    import os
     """
     Purpose:
         Logs the String with a time and date into bot.log.
@@ -20,31 +134,174 @@ def bot_logger(path, bot, string):
         :param bot: The name of the bot using the log function.
         :param path: Filepath of where to save the log file.
     Post-Conditions:
-        Saves all necessary data to the log file.
+        Queues the line for the bot's background log writer.
     Return:
         None
     """
-    now = str(datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
-    folder = path
-    if not os.path.exists(folder):
-        os.makedirs(folder)
-    try:
-        file = open(folder + bot + ".log", "a")
-    except:
-        file = open(folder + bot + ".log", "w")
-        file.close()
-        file = open(folder + bot + ".log", "a")
-    file.write("[" + now + "]: [" + bot + " Log] " + string + "\n")
-    print("[" + now + "]: [" + bot + " Log] " + string)
-    file.close()
+    get_logger(path, bot).log(string)
+
+# Seconds a Twitch login to user id lookup is cached, and the most logins kept.
+TWITCH_ID_TTL = 24 * 60 * 60
+TWITCH_ID_CACHE_SIZE = 4096
+
+class TwitchClient:
+    """
+    Purpose:
+        Looks up Twitch user ids, caching the app access token until it expires and
+        each login's id for TWITCH_ID_TTL seconds.
+    Pre-Conditions:
+        :param client_id: The Twitch client id, defaults to TWITCH_CLIENT_ID.
+        :param client_secret: The Twitch client secret, defaults to TWITCH_CLIENT_SECRET.
+        :param id_ttl: Seconds a login's id is cached.
+        :param maxsize: The most logins cached, least recently used are evicted first.
+    Post-Conditions:
+        Async lookups share one aiohttp session, call close() to release it.
+    """
+    TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+    USERS_URL = "https://api.twitch.tv/helix/users"
+
+    def __init__(self, client_id: str | None = None, client_secret: str | None = None, id_ttl: float = TWITCH_ID_TTL, maxsize: int = TWITCH_ID_CACHE_SIZE) -> None:
+        self.client_id = client_id or os.getenv("TWITCH_CLIENT_ID")
+        self.client_secret = client_secret or os.getenv("TWITCH_CLIENT_SECRET")
+        self.id_ttl = id_ttl
+        self.maxsize = maxsize
+        self._ids = OrderedDict()
+        self._token = None
+        self._token_expires = 0
+        self._token_lock = threading.Lock()
+        self._async_token_lock = None
+        self._session = None
+
+    # Cache bookkeeping shared by the sync and async lookups.
+    def _cached_id(self, login: str) -> str | None:
+        entry = self._ids.get(login.lower())
+        if entry == None or entry[0] <= time.monotonic():
+            return None
+        self._ids.move_to_end(login.lower())
+        return entry[1]
+
+    def _store_id(self, login: str, twitch_id: str) -> None:
+        self._ids[login.lower()] = (time.monotonic() + self.id_ttl, twitch_id)
+        self._ids.move_to_end(login.lower())
+        while len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+
+    def _token_fresh(self, stale: str | None) -> bool:
+        # A token is reused until a minute before it expires, or until it's rejected.
+        return self._token != None and self._token != stale and time.monotonic() < self._token_expires - 60
+
+    def _store_token(self, data: dict) -> str:
+        self._token = data["access_token"]
+        self._token_expires = time.monotonic() + data.get("expires_in", 3600)
+        return self._token
+
+    def _token_form(self) -> dict:
+        return {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'grant_type': 'client_credentials'
+        }
+
+    def _headers(self, token: str) -> dict:
+        return {
+            'Authorization': 'Bearer ' + token,
+            'Client-Id': self.client_id,
+        }
+
+    async def session(self):
+        import aiohttp
+        if self._session == None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        return self._session
+
+    async def token(self, stale: str | None = None) -> str:
+        """Returns a valid app access token, replacing it if it is the rejected stale token."""
+        if self._async_token_lock == None:
+            self._async_token_lock = asyncio.Lock()
+        async with self._async_token_lock:
+            if self._token_fresh(stale):
+                return self._token
+            session = await self.session()
+            async with session.post(self.TOKEN_URL, data=self._token_form()) as response:
+                response.raise_for_status()
+                return self._store_token(await response.json())
+
+    async def get_user_id(self, twitch_name: str) -> str:
+        """
+        Purpose:
+            Uses the Twitch API to collect a user id from a username, without blocking the event loop.
+        Pre-Conditions:
+            :param twitch_name: The username of the Twitch user to collect the id of.
+        Post-Conditions:
+            The id is cached for id_ttl seconds.
+        Return:
+            The Twitch user id of the specified user.
+        """
+        twitch_id = self._cached_id(twitch_name)
+        if twitch_id != None:
+            return twitch_id
+
+        session = await self.session()
+        token = await self.token()
+        for attempt in range(2):
+            async with session.get(self.USERS_URL, headers=self._headers(token), params=(('login', twitch_name),)) as response:
+                # The token was revoked or expired early, so fetch a new one and retry once.
+                if response.status == 401 and attempt == 0:
+                    token = await self.token(stale=token)
+                    continue
+                response.raise_for_status()
+                data = await response.json()
+                break
+
+        twitch_id = data["data"][0]["id"]
+        self._store_id(twitch_name, twitch_id)
+        return twitch_id
+
+    def get_user_id_sync(self, twitch_name: str) -> str:
+        """The blocking version of get_user_id(), for code running outside the event loop."""
+        import requests
+
+        twitch_id = self._cached_id(twitch_name)
+        if twitch_id != None:
+            return twitch_id
+
+        token = None
+        for attempt in range(2):
+            with self._token_lock:
+                if not self._token_fresh(token):
+                    token_response = requests.post(self.TOKEN_URL, data=self._token_form(), timeout=10)
+                    token_response.raise_for_status()
+                    self._store_token(token_response.json())
+                token = self._token
+
+            twitch_id_response = requests.get(self.USERS_URL, headers=self._headers(token), params=(('login', twitch_name),), timeout=10)
+            if twitch_id_response.status_code == 401 and attempt == 0:
+                continue
+            twitch_id_response.raise_for_status()
+            break
+
+        twitch_id = twitch_id_response.json()["data"][0]["id"]
+        self._store_id(twitch_name, twitch_id)
+        return twitch_id
+
+    async def close(self) -> None:
+        if self._session != None:
+            await self._session.close()
+
+_twitch_client = None
+
+def get_twitch_client() -> TwitchClient:
+    # The shared TwitchClient, so every lookup reuses the same token, cache and session.
+    global _twitch_client
+    if _twitch_client == None:
+        _twitch_client = TwitchClient()
+    return _twitch_client
 
 def get_twitch_id(twitch_name):
-    import os
-    import requests
-    import json
     """
     Purpose:
         Uses the Twitch API to collect a user id from a username.
+        This blocks, so cogs should await get_twitch_client().get_user_id() instead.
     Pre-Conditions:
         :param twitch_name: The username of the Twitch user to collect the id of.
     Post-Conditions:
@@ -52,36 +309,135 @@ def get_twitch_id(twitch_name):
     Return:
         The Twitch user id of the specified user.
     """
-    client_id = os.getenv("TWITCH_CLIENT_ID")
-    
-    token_response = requests.post(
-        'https://id.twitch.tv/oauth2/token',
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded',
-            },
-        data = {
-            'client_id': client_id,
-            'client_secret': os.getenv("TWITCH_CLIENT_SECRET"),
-            'grant_type': 'client_credentials'
-        }
-    )
+    return get_twitch_client().get_user_id_sync(twitch_name)
 
-    twitch_id_response = requests.get(
-        'https://api.twitch.tv/helix/users',
-        headers = {
-            'Authorization': 'Bearer ' + json.loads(token_response.content)["access_token"],
-            'Client-Id': client_id,
-            },
-        params=(('login', twitch_name),)
-        )
+class ConnectionPool:
+    """
+    Purpose:
+        A bounded, thread-safe pool of database connections.
+    Pre-Conditions:
+        :param connect: Function that opens a new connection, e.g. mysql.connector.connect with its config.
+        :param size: The most connections open at once, callers beyond that wait for one to be returned.
+        :param timeout: Seconds a caller waits for a connection before TimeoutError, None to wait forever.
+    Post-Conditions:
+        Connections are returned to the pool after use, or closed if the caller raised.
+    """
+    def __init__(self, connect, size: int = 5, timeout: float | None = 10) -> None:
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.in_use = 0
+        self.waiting = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def metrics(self) -> dict:
+        return {"size": self.size, "in_use": self.in_use, "idle": self._idle.qsize(), "waiting": self.waiting}
+
+    def _checkout(self):
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        with self._lock:
+            self.waiting -= 1
+        if not acquired:
+            raise TimeoutError(f"No database connection free after {self.timeout}s")
+
+        try:
+            # Reuse an idle connection if it's still alive, otherwise open a new one.
+            while True:
+                try:
+                    cnx = self._idle.get_nowait()
+                except queue.Empty:
+                    cnx = self.connect()
+                    break
+                if getattr(cnx, "is_connected", lambda: True)():
+                    break
+                self._discard(cnx)
+        except:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_use += 1
+        return cnx
+
+    def _checkin(self, cnx, healthy: bool) -> None:
+        if healthy:
+            # End the borrower's transaction, or the next one reads from its stale snapshot.
+            try:
+                cnx.rollback()
+            except:
+                healthy = False
+        if healthy:
+            self._idle.put(cnx)
+        else:
+            self._discard(cnx)
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    @staticmethod
+    def _discard(cnx) -> None:
+        try:
+            cnx.close()
+        except:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection for the duration of a with block."""
+        cnx = self._checkout()
+        try:
+            yield cnx
+        except:
+            self._checkin(cnx, False)
+            raise
+        self._checkin(cnx, True)
+
+    def close(self) -> None:
+        # Closes the idle connections, borrowed ones are closed as they're returned.
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """
+    Purpose:
+        Returns the shared MySQL connection pool, creating it from the MYSQL_* environment on first use.
+    Pre-Conditions:
+        None
+    Post-Conditions:
+        None
+    Return:
+        The shared ConnectionPool.
+    """
+    global _pool
+    import mysql.connector
+
+    config = {
+            'user': os.getenv("MYSQL_USER"),
+            'password': os.getenv("MYSQL_PASSWORD"),
+            'host': os.getenv("MYSQL_HOST"),
+            'database': os.getenv("MYSQL_DATABASE"),
+            'raise_on_warnings': True
+        }
 
-    return json.loads(twitch_id_response.content)["data"][0]["id"]
+    with _pool_lock:
+        if _pool == None:
+            _pool = ConnectionPool(lambda: mysql.connector.connect(**config), size=int(os.getenv("MYSQL_POOL_SIZE", 5)))
+        return _pool
 
 # Function for linking different media accounts to the database.
-def link_account(from_platform, from_platform_username, from_platform_id, to_platform, to_platform_username):
+def link_account(from_platform, from_platform_username, from_platform_id, to_platform, to_platform_username, pool=None, twitch_id=None):
     import mysql.connector
     from mysql.connector import errorcode
-    import os
     """
     Purpose:
         To link user accounts within the database.
@@ -91,19 +447,13 @@ def link_account(from_platform, from_platform_username, from_platform_id, to_pla
         :param from_platform_id: The "from" platform username id of the user.
         :param to_platform: The platform the user is linking to.
         :param to_platform_username: The "to" platform username of the user.
+        :param pool: The ConnectionPool to use, defaults to get_pool().
+        :param twitch_id: The already resolved Twitch id when linking to Twitch, looked up if None.
     Post-Conditions:
         Link the specified user data within the database
     Return:
         A message notifying the user of their success/failure.
     """
-    config = {
-            'user': os.getenv("MYSQL_USER"),
-            'password': os.getenv("MYSQL_PASSWORD"),
-            'host': os.getenv("MYSQL_HOST"),
-            'database': os.getenv("MYSQL_DATABASE"),
-            'raise_on_warnings': True
-        }
-
     # Simple injection sterilization
     from_platform = from_platform.replace("--","").replace("/*","").replace("%00","").replace("%16","")
     from_platform_username = from_platform_username.replace("--","").replace("/*","").replace("%00","").replace("%16","")
@@ -125,64 +475,67 @@ def link_account(from_platform, from_platform_username, from_platform_id, to_pla
         "to_platform_username": to_platform_username
     }
 
+    if pool == None:
+        pool = get_pool()
+
     try:
-        cnx = mysql.connector.connect(**config)
-        cursor = cnx.cursor()
+        with pool.connection() as cnx:
+            cursor = cnx.cursor()
+            try:
+                if to_platform == "minecraft":
+                    mc_id_query = "SELECT player_id FROM player_data WHERE player_name = %(to_platform_username)s"
+                else:
+                    mc_id_query = "SELECT player_id FROM linked_accounts WHERE " + from_platform + " = %(from_platform_username)s"
 
-        if to_platform == "minecraft":
-            mc_id_query = "SELECT player_id FROM player_data WHERE player_name = %(to_platform_username)s"
-        else:
-            mc_id_query = "SELECT player_id FROM linked_accounts WHERE " + from_platform + " = %(from_platform_username)s"
+                cursor.execute(mc_id_query, account_data)
 
-        cursor.execute(mc_id_query, account_data)
+                data = cursor.fetchall()
+                if data != []:
+                    account_data["player_id"] = str(data[0][0])
+                else:
+                    return err_msg
 
-        data = cursor.fetchall()
-        if data != []:
-            account_data["player_id"] = str(data[0][0])
-        else:
-            return err_msg
-
-        # Creates new entry if player not referenced in linked_accounts, otherwise updates entry.
-        init_row_query = (
-                "INSERT INTO linked_accounts (player_id)"
-                "SELECT (" + account_data["player_id"] + ")"
-                "FROM DUAL WHERE NOT EXISTS (SELECT * FROM linked_accounts "
-                "WHERE player_id = " + account_data["player_id"] + " LIMIT 1)"
-                )
-        cursor.execute(init_row_query, account_data)
-        cnx.commit()
-
-        if to_platform != "minecraft":
-            # Link TO platform account
-            link_account_query = (
-                "UPDATE linked_accounts SET " + to_platform + " = %(to_platform_username)s WHERE player_id = " + account_data["player_id"] + ";"
-            )
-            cursor.execute(link_account_query, account_data)
-            
-            # Grab the Twitch id from the Twitch API
-            if to_platform == 'twitch':
-                twitch_id = get_twitch_id(to_platform_username)
-                link_account_id_query = (
-                    "UPDATE linked_accounts SET " + to_platform + "_id = " + twitch_id + " WHERE player_id = " + account_data["player_id"] + ";"
-                )
-                cursor.execute(link_account_id_query, account_data)
-
-            cnx.commit()
-
-        # Gather FROM user info
-        if from_platform in ['discord', 'twitch']:
-            platform_username_query = (
-                "UPDATE linked_accounts SET " + from_platform + " = %(from_platform_username)s WHERE player_id = " + account_data["player_id"] + ";"
-            )
-            platform_id_query = (
-                "UPDATE linked_accounts SET " + from_platform + "_id = " + from_platform_id + " WHERE player_id = " + account_data["player_id"] + ";"
-            )
-            cursor.execute(platform_username_query, account_data)
-            cursor.execute(platform_id_query, account_data)
-            cnx.commit()
-
-            cursor.close()
-            cnx.close()
+                # Creates new entry if player not referenced in linked_accounts, otherwise updates entry.
+                init_row_query = (
+                        "INSERT INTO linked_accounts (player_id)"
+                        "SELECT (" + account_data["player_id"] + ")"
+                        "FROM DUAL WHERE NOT EXISTS (SELECT * FROM linked_accounts "
+                        "WHERE player_id = " + account_data["player_id"] + " LIMIT 1)"
+                        )
+                cursor.execute(init_row_query, account_data)
+                cnx.commit()
+
+                if to_platform != "minecraft":
+                    # Link TO platform account
+                    link_account_query = (
+                        "UPDATE linked_accounts SET " + to_platform + " = %(to_platform_username)s WHERE player_id = " + account_data["player_id"] + ";"
+                    )
+                    cursor.execute(link_account_query, account_data)
+
+                    # Grab the Twitch id from the Twitch API
+                    if to_platform == 'twitch':
+                        if twitch_id == None:
+                            twitch_id = get_twitch_id(to_platform_username)
+                        link_account_id_query = (
+                            "UPDATE linked_accounts SET " + to_platform + "_id = " + twitch_id + " WHERE player_id = " + account_data["player_id"] + ";"
+                        )
+                        cursor.execute(link_account_id_query, account_data)
+
+                    cnx.commit()
+
+                # Gather FROM user info
+                if from_platform in ['discord', 'twitch']:
+                    platform_username_query = (
+                        "UPDATE linked_accounts SET " + from_platform + " = %(from_platform_username)s WHERE player_id = " + account_data["player_id"] + ";"
+                    )
+                    platform_id_query = (
+                        "UPDATE linked_accounts SET " + from_platform + "_id = " + from_platform_id + " WHERE player_id = " + account_data["player_id"] + ";"
+                    )
+                    cursor.execute(platform_username_query, account_data)
+                    cursor.execute(platform_id_query, account_data)
+                    cnx.commit()
+            finally:
+                cursor.close()
 
         return f"You have successfully linked your {to_platform} account!"
 
@@ -193,5 +546,21 @@ def link_account(from_platform, from_platform_username, from_platform_id, to_pla
             print("Database does not exist")
         else:
             print(err)
-    else:
-        cnx.close()
+
+async def async_link_account(from_platform, from_platform_username, from_platform_id, to_platform, to_platform_username, pool=None):
+    """
+    Purpose:
+        link_account() for cogs, run on a worker thread so the database never blocks the event loop.
+    Pre-Conditions:
+        The same as link_account().
+    Post-Conditions:
+        Link the specified user data within the database
+    Return:
+        A message notifying the user of their success/failure.
+    """
+    # Resolve the Twitch id on the event loop first, so the worker thread doesn't block on HTTP.
+    twitch_id = None
+    if to_platform == 'twitch':
+        twitch_id = await get_twitch_client().get_user_id(to_platform_username)
+
+    return await asyncio.to_thread(link_account, from_platform, from_platform_username, from_platform_id, to_platform, to_platform_username, pool, twitch_id)
@@ -0,0 +1,190 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Discord Edit Dispatcher Library
+# Purpose: Send every message edit through per-channel rate limits, latest state only.
+# Date: 18OCTOBER2026
+#--------------------------------------------------------------------
+
+import asyncio
+import time
+from collections import deque
+
+# Edits a channel is sent per second once its burst is used up, and the burst. Discord allows
+# about 5 edits per 5 seconds per channel, anything faster is held back by 429s anyway.
+DISPATCH_RATE = 1.0
+DISPATCH_BURST = 5
+
+# Maximum background edits in flight at once, across every channel.
+DISPATCH_CONCURRENCY = 10
+
+class TokenBucket:
+    """
+    Purpose:
+        Allows rate events a second, with bursts of up to burst.
+    Pre-Conditions:
+        :param rate: Tokens added per second, 0 or less for no limit.
+        :param burst: The most tokens held.
+    """
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """Seconds until a token is available, 0 if one is now."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    async def take(self) -> None:
+        while (delay := self.delay()) > 0:
+            await asyncio.sleep(delay)
+        if self.rate > 0:
+            self.tokens -= 1
+
+class PendingEdit:
+    # The latest state queued for one message, and the future every caller waiting on it shares.
+    __slots__ = ("message", "kwargs", "interactive", "future")
+
+    def __init__(self, message, kwargs: dict, interactive: bool) -> None:
+        self.message = message
+        self.kwargs = kwargs
+        self.interactive = interactive
+        self.future = asyncio.get_running_loop().create_future()
+        # Superseded callers might never look, so a failed edit shouldn't warn about it.
+        self.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+class ChannelQueue:
+    # A channel's rate limit and the messages waiting on it, interactive edits first.
+    def __init__(self, rate: float, burst: int) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.interactive = deque()
+        self.background = deque()
+
+    def __len__(self) -> int:
+        return len(self.interactive) + len(self.background)
+
+    def pop(self) -> int:
+        return self.interactive.popleft() if len(self.interactive) > 0 else self.background.popleft()
+
+class EditDispatcher:
+    """
+    Purpose:
+        Owns every outgoing message edit. Each channel drains through its own token bucket,
+        an edit queued for a message that already has one pending replaces it so only the
+        latest state is sent, and interactive edits go ahead of background ones.
+    Pre-Conditions:
+        :param rate: Edits per second per channel, 0 or less for no limit.
+        :param burst: Edits a channel can be sent at once before rate applies.
+        :param concurrency: Maximum background edits in flight across every channel.
+    """
+    def __init__(self, rate: float = DISPATCH_RATE, burst: int = DISPATCH_BURST, concurrency: int = DISPATCH_CONCURRENCY) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.slots = asyncio.Semaphore(concurrency)
+        self.coalesced = 0
+        self.sent = 0
+        # {message_id: PendingEdit}, {channel_id: ChannelQueue}, {channel_id: drain task} and {message_id: edit in flight}.
+        self._pending = {}
+        self._channels = {}
+        self._workers = {}
+        self._sending = {}
+
+    def depth(self, interactive: bool | None = None) -> int:
+        """Edits waiting to be sent, only interactive or background ones if given."""
+        if interactive == None:
+            return len(self._pending)
+        return len([pending for pending in self._pending.values() if pending.interactive == interactive])
+
+    async def edit(self, message, interactive: bool = False, **kwargs):
+        """
+        Purpose:
+            Queues message.edit(**kwargs) and waits for it, or for the edit that replaced it.
+        Pre-Conditions:
+            :param message: A discord.Message or discord.PartialMessage.
+            :param interactive: Whether a user is waiting on the edit, it jumps the background queue.
+        Return:
+            What message.edit returned, its exception is raised.
+        """
+        pending = self._pending.get(message.id)
+        if pending != None:
+            # Still queued, send this state instead of the older one.
+            self.coalesced += 1
+            pending.message = message
+            pending.kwargs = kwargs
+            if interactive and not pending.interactive:
+                pending.interactive = True
+                queue = self._channels[message.channel.id]
+                queue.background.remove(message.id)
+                queue.interactive.append(message.id)
+        else:
+            pending = self._pending[message.id] = PendingEdit(message, kwargs, interactive)
+            queue = self._channels.get(message.channel.id)
+            if queue == None:
+                queue = self._channels[message.channel.id] = ChannelQueue(self.rate, self.burst)
+            (queue.interactive if interactive else queue.background).append(message.id)
+            if message.channel.id not in self._workers:
+                self._workers[message.channel.id] = asyncio.ensure_future(self._drain(message.channel.id))
+
+        # A caller giving up doesn't cancel the edit others are waiting on too.
+        return await asyncio.shield(pending.future)
+
+    async def _drain(self, channel_id: int) -> None:
+        queue = self._channels[channel_id]
+        try:
+            while len(queue) > 0:
+                await queue.bucket.take()
+                # Background edits wait for a slot, interactive ones are never held back by them.
+                slot = len(queue.interactive) == 0
+                if slot:
+                    await self.slots.acquire()
+                pending = self._pending.pop(queue.pop())
+                if slot and pending.interactive:
+                    self.slots.release()
+                    slot = False
+                try:
+                    # Edits to one message land in the order they were queued.
+                    previous = self._sending.get(pending.message.id)
+                    if previous != None:
+                        await asyncio.wait([previous])
+                except asyncio.CancelledError:
+                    pending.future.cancel()
+                    if slot:
+                        self.slots.release()
+                    raise
+                send = self._sending[pending.message.id] = asyncio.ensure_future(self._send(pending, slot))
+                send.add_done_callback(lambda task, message_id=pending.message.id: self._sent(message_id, task))
+        finally:
+            del self._workers[channel_id]
+            # The bucket is only worth keeping while it still remembers recent edits.
+            if len(queue) == 0 and queue.bucket.delay() == 0 and queue.bucket.tokens >= queue.bucket.burst:
+                del self._channels[channel_id]
+
+    async def _send(self, pending: PendingEdit, slot: bool) -> None:
+        try:
+            pending.future.set_result(await pending.message.edit(**pending.kwargs))
+        except asyncio.CancelledError:
+            pending.future.cancel()
+            raise
+        except Exception as err:
+            pending.future.set_exception(err)
+        finally:
+            if slot:
+                self.slots.release()
+            self.sent += 1
+
+    def _sent(self, message_id: int, task: asyncio.Task) -> None:
+        if self._sending.get(message_id) is task:
+            del self._sending[message_id]
+
+    def close(self) -> None:
+        """Cancels every queued edit."""
+        for task in list(self._workers.values()) + list(self._sending.values()):
+            task.cancel()
+        for pending in self._pending.values():
+            pending.future.cancel()
+        self._pending.clear()
@@ -0,0 +1,321 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Server History Library
+# Purpose: Compact player count, latency and uptime history for tracked servers.
+# Date: 18OCTOBER2026
+#--------------------------------------------------------------------
+
+import base64
+import json
+import os
+import struct
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+
+# (seconds per slot, slots) of each tier, every sample is folded into all three.
+# 6 hours by the minute, 14 days by the hour and a year by the day, 12 bytes a slot.
+TIERS = ((60, 360), (3600, 336), (86400, 365))
+
+# The most addresses kept, the least recently sampled are dropped first.
+HISTORY_SIZE = 4096
+
+# Chart size and colours.
+CHART_WIDTH = 600
+CHART_HEIGHT = 200
+STRIP_HEIGHT = 14
+BACKGROUND = (47, 49, 54)
+GRID = (70, 73, 80)
+PLAYERS = (101, 191, 101)
+LATENCY = (114, 137, 218)
+UP = (101, 191, 101)
+PARTIAL = (230, 209, 50)
+DOWN = (191, 15, 15)
+NO_DATA = (79, 84, 92)
+
+class Tier:
+    """
+    Purpose:
+        A ring buffer of fixed-width time slots, each summing the samples that fell in it.
+        Arrays rather than objects, so a slot costs 12 bytes.
+    Pre-Conditions:
+        :param step: Seconds per slot.
+        :param size: Number of slots.
+    """
+    def __init__(self, step: int, size: int) -> None:
+        self.step = step
+        self.size = size
+        # The absolute index (time // step) of the newest slot, None while empty.
+        self.last = None
+        self.count = array("H", bytes(2 * size))
+        self.up = array("H", bytes(2 * size))
+        self.players = array("f", bytes(4 * size))
+        self.latency = array("f", bytes(4 * size))
+
+    def _clear(self, index: int) -> None:
+        i = index % self.size
+        self.count[i] = 0
+        self.up[i] = 0
+        self.players[i] = 0.0
+        self.latency[i] = 0.0
+
+    def add(self, timestamp: float, online: bool, players: int, latency: float | None) -> None:
+        index = int(timestamp // self.step)
+        if self.last == None:
+            self.last = index
+        elif index > self.last:
+            # Slots skipped since the last sample hold older data, clear them.
+            for skipped in range(self.last + 1, min(index, self.last + self.size) + 1):
+                self._clear(skipped)
+            self.last = index
+        elif index <= self.last - self.size:
+            return
+
+        i = index % self.size
+        if self.count[i] == 0xffff:
+            return
+        self.count[i] += 1
+        if online:
+            self.up[i] += 1
+            self.players[i] += players
+            if latency != None:
+                self.latency[i] += latency
+
+    def points(self) -> list:
+        """Returns (slot start, samples, uptime, average players, average latency) for every slot, oldest first."""
+        if self.last == None:
+            return []
+        points = []
+        for index in range(self.last - self.size + 1, self.last + 1):
+            i = index % self.size
+            count = self.count[i]
+            up = self.up[i]
+            points.append((
+                index * self.step,
+                count,
+                up / count if count > 0 else None,
+                self.players[i] / up if up > 0 else None,
+                self.latency[i] / up if up > 0 else None,
+            ))
+        return points
+
+    def copy(self) -> "Tier":
+        tier = Tier.__new__(Tier)
+        (tier.step, tier.size, tier.last) = (self.step, self.size, self.last)
+        (tier.count, tier.up, tier.players, tier.latency) = (self.count[:], self.up[:], self.players[:], self.latency[:])
+        return tier
+
+    def dumps(self) -> list:
+        return [self.last] + [base64.b64encode(values.tobytes()).decode() for values in (self.count, self.up, self.players, self.latency)]
+
+    def loads(self, data: list) -> None:
+        self.last = data[0]
+        for (values, text) in zip((self.count, self.up, self.players, self.latency), data[1:]):
+            raw = base64.b64decode(text)
+            if len(raw) != len(values) * values.itemsize:
+                raise ValueError("Tier size changed")
+            values[:] = array(values.typecode, raw)
+
+class History:
+    """
+    Purpose:
+        Player count, latency and uptime history of each address, kept in a minute, an hour
+        and a day tier so memory stays fixed per address.
+    Pre-Conditions:
+        :param filename: Path of the JSON file the history is kept in, or None to keep it in memory.
+        :param tiers: (seconds per slot, slots) of each tier.
+        :param maxsize: The most addresses kept.
+    """
+    def __init__(self, filename: str | None = None, tiers: tuple = TIERS, maxsize: int = HISTORY_SIZE) -> None:
+        self.filename = filename
+        self.tiers = tuple(tuple(tier) for tier in tiers)
+        self.maxsize = maxsize
+        self.dirty = False
+        self._series = OrderedDict()
+        # The timestamp of each address's newest sample.
+        self._latest = {}
+        if filename != None:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._series
+
+    def record(self, key: str, snapshot, timestamp: float | None = None) -> bool:
+        """
+        Purpose:
+            Adds a ServerSnapshot to an address's history.
+        Pre-Conditions:
+            :param timestamp: When the snapshot was probed, now if None. A snapshot no newer than the
+                address's last sample is the same probe served again from a cache, and is skipped.
+        Return:
+            Whether the sample was added.
+        """
+        timestamp = timestamp if timestamp != None else time.time()
+        if timestamp <= self._latest.get(key, float("-inf")):
+            return False
+        self._latest[key] = timestamp
+        series = self._series.get(key)
+        if series == None:
+            series = self._series[key] = [Tier(step, size) for (step, size) in self.tiers]
+            while len(self._series) > self.maxsize:
+                self._latest.pop(self._series.popitem(last=False)[0], None)
+        else:
+            self._series.move_to_end(key)
+        for tier in series:
+            tier.add(timestamp, snapshot.online, snapshot.players_online or 0, snapshot.latency)
+        self.dirty = True
+        return True
+
+    def points(self, key: str, tier: int) -> list:
+        series = self._series.get(key)
+        return series[tier].points() if series != None else []
+
+    def load(self) -> None:
+        try:
+            with open(self.filename) as json_file:
+                data = json.load(json_file)
+                json_file.close()
+        except (OSError, ValueError):
+            return
+        # History written with other tiers can't be read back into these, so it's dropped.
+        if [tuple(tier) for tier in data.get("tiers", [])] != list(self.tiers):
+            return
+        for (key, tiers) in data.get("addresses", {}).items():
+            series = [Tier(step, size) for (step, size) in self.tiers]
+            try:
+                for (tier, dump) in zip(series, tiers):
+                    tier.loads(dump)
+            except (ValueError, TypeError, IndexError):
+                continue
+            self._series[key] = series
+
+    def snapshot(self) -> list:
+        """Copies every address's tiers, quick enough for the event loop, to be dumps()ed from a thread."""
+        self.dirty = False
+        return [(key, [tier.copy() for tier in series]) for (key, series) in self._series.items()]
+
+    def dumps(self, snapshot: list | None = None) -> str:
+        """Serializes a snapshot() of the history, or the history as it is now if none is given."""
+        return json.dumps({
+            "tiers": self.tiers,
+            "addresses": {key: [tier.dumps() for tier in series] for (key, series) in (snapshot if snapshot != None else self.snapshot())},
+        })
+
+    def write(self, text: str) -> None:
+        with open(self.filename + ".tmp", "w") as json_file:
+            json_file.write(text)
+            json_file.close()
+        os.replace(self.filename + ".tmp", self.filename)
+
+    def save(self, snapshot: list | None = None) -> None:
+        if self.filename != None:
+            self.write(self.dumps(snapshot))
+
+def summarize(points: list) -> dict:
+    """Returns the uptime, peak and average players and average latency over some points."""
+    sampled = [point for point in points if point[1] > 0]
+    up = [point for point in sampled if point[3] != None]
+    latency = [point[4] for point in up if point[4] != None and point[4] > 0]
+    return {
+        "samples": sum(point[1] for point in sampled),
+        "uptime": sum(point[2] * point[1] for point in sampled) / sum(point[1] for point in sampled) if sampled != [] else None,
+        "peak": max(point[3] for point in up) if up != [] else None,
+        "average": sum(point[3] for point in up) / len(up) if up != [] else None,
+        "latency": sum(latency) / len(latency) if latency != [] else None,
+    }
+
+class Canvas:
+    # Just enough of a raster to draw a chart and save it as a PNG, no imaging dependency needed.
+    def __init__(self, width: int, height: int, color: tuple) -> None:
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(bytes(color) * (width * height))
+
+    def rect(self, x0: int, y0: int, x1: int, y1: int, color: tuple) -> None:
+        x0, x1 = max(0, min(x0, x1)), min(self.width, max(x0, x1))
+        y0, y1 = max(0, min(y0, y1)), min(self.height, max(y0, y1))
+        if x1 <= x0:
+            return
+        row = bytes(color) * (x1 - x0)
+        for y in range(y0, y1):
+            start = (y * self.width + x0) * 3
+            self.pixels[start:start + len(row)] = row
+
+    def line(self, x0: int, y0: int, x1: int, y1: int, color: tuple) -> None:
+        # Bresenham, one pixel wide.
+        dx, dy = abs(x1 - x0), -abs(y1 - y0)
+        sx, sy = (1 if x0 < x1 else -1), (1 if y0 < y1 else -1)
+        error = dx + dy
+        while True:
+            if 0 <= x0 < self.width and 0 <= y0 < self.height:
+                i = (y0 * self.width + x0) * 3
+                self.pixels[i:i + 3] = bytes(color)
+            if x0 == x1 and y0 == y1:
+                return
+            double = 2 * error
+            if double >= dy:
+                error += dy
+                x0 += sx
+            if double <= dx:
+                error += dx
+                y0 += sy
+
+    def png(self) -> bytes:
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+        stride = self.width * 3
+        raw = b"".join(b"\x00" + bytes(self.pixels[y * stride:(y + 1) * stride]) for y in range(self.height))
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+        return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+def render_chart(points: list, width: int = CHART_WIDTH, height: int = CHART_HEIGHT) -> bytes:
+    """
+    Purpose:
+        Draws a player count chart, with average latency overlaid, above an uptime strip.
+    Pre-Conditions:
+        :param points: Tier points, oldest first.
+    Return:
+        The chart as PNG bytes.
+    """
+    canvas = Canvas(width, height, BACKGROUND)
+    top = 8
+    bottom = height - STRIP_HEIGHT - 6
+    players = [point[3] for point in points if point[3] != None]
+    latencies = [point[4] for point in points if point[4] != None]
+    peak = max(max(players, default=0), 1)
+    slowest = max(max(latencies, default=0), 1)
+
+    for i in range(5):
+        y = bottom - (bottom - top) * i // 4
+        canvas.line(0, y, width - 1, y, GRID)
+
+    def x_of(i: int) -> int:
+        return i * (width - 1) // max(1, len(points) - 1)
+
+    def y_of(value: float, scale: float) -> int:
+        return bottom - round((bottom - top) * value / scale)
+
+    previous = {}
+    for (i, point) in enumerate(points):
+        x = x_of(i)
+        # Uptime strip, one column per slot.
+        uptime = point[2]
+        color = NO_DATA if uptime == None else UP if uptime >= 0.99 else DOWN if uptime <= 0.01 else PARTIAL
+        canvas.rect(x, height - STRIP_HEIGHT, x_of(i + 1) if i + 1 < len(points) else width, height, color)
+
+        for (value, scale, color, name) in ((point[4], slowest, LATENCY, "latency"), (point[3], peak, PLAYERS, "players")):
+            if value == None:
+                previous.pop(name, None)
+                continue
+            y = y_of(value, scale)
+            if name in previous:
+                canvas.line(previous[name][0], previous[name][1], x, y, color)
+            else:
+                canvas.line(x, y, x, y, color)
+            previous[name] = (x, y)
+
+    return canvas.png()
@@ -0,0 +1,195 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Metrics Library
+# Purpose: Counters and histograms for the status_bot, in the Prometheus text format.
+# Date: 18OCTOBER2026
+#--------------------------------------------------------------------
+
+import asyncio
+import bisect
+import logging
+import time
+
+# Default histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CYCLE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Seconds between event loop lag samples.
+LAG_INTERVAL = 1.0
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for (name, value) in zip(names, values)]
+    if extra != "":
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs != [] else ""
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Registry:
+    """
+    Purpose:
+        Holds every metric. While disabled, recording a metric returns straight away,
+        so instrumented code costs one attribute check.
+    Pre-Conditions:
+        :param enabled: Whether metrics are recorded.
+    """
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def callback(self, name: str, help: str, kind: str, function) -> None:
+        """Registers a metric read at scrape time, function returns a number. Re-registering replaces it."""
+        self.register(Callback(name, help, kind, function))
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, registry: Registry, name: str, help: str, labels: tuple = ()) -> None:
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        registry.register(self)
+
+    def inc(self, *labels, value: float = 1) -> None:
+        if not self.registry.enabled:
+            return
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def get(self, *labels) -> float:
+        return self.values.get(labels, 0)
+
+    def render(self) -> list:
+        return [f"{self.name}{_labels(self.labels, labels)} {_number(value)}" for (labels, value) in self.values.items()]
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, registry: Registry, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> None:
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # {labels: [count per bucket, with +Inf last], sum, count}
+        self.values = {}
+        registry.register(self)
+
+    def observe(self, value: float, *labels) -> None:
+        if not self.registry.enabled:
+            return
+        entry = self.values.get(labels)
+        if entry == None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def quantile(self, q: float, *labels) -> float | None:
+        """Estimates a quantile from the buckets, the upper bound of the bucket it falls in."""
+        entry = self.values.get(labels)
+        if entry == None or entry[2] == 0:
+            return None
+        total = 0
+        for (i, count) in enumerate(entry[0]):
+            total += count
+            if total >= q * entry[2]:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def render(self) -> list:
+        lines = []
+        for (labels, (counts, total, count)) in self.values.items():
+            cumulative = 0
+            for (bound, bucket) in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+class Callback:
+    # A counter or gauge owned by something else, read when the metrics are rendered.
+    def __init__(self, name: str, help: str, kind: str, function) -> None:
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.function = function
+
+    def render(self) -> list:
+        try:
+            return [f"{self.name} {_number(self.function())}"]
+        except Exception:
+            return []
+
+REGISTRY = Registry()
+
+PROBES = Counter(REGISTRY, "status_probes_total", "Protocol probes by protocol and result (ok, timeout, error).", ("protocol", "result"))
+PROBE_SECONDS = Histogram(REGISTRY, "status_probe_seconds", "Protocol probe duration by protocol.", ("protocol",))
+TRACKER_REFRESH_SECONDS = Histogram(REGISTRY, "status_tracker_refresh_seconds", "Duration of each tracker refresh.", buckets=CYCLE_BUCKETS)
+TRACKER_MESSAGES = Counter(REGISTRY, "status_tracker_messages_total", "Tracked messages refreshed, by outcome.", ("outcome",))
+TRACKER_SKIPPED = Counter(REGISTRY, "status_tracker_skipped_total", "Due tracked messages skipped because their last refresh was still running.")
+DISCORD_REQUESTS = Counter(REGISTRY, "status_discord_requests_total", "Discord message edits and fetches sent, by kind and result.", ("kind", "result"))
+RATE_LIMITS = Counter(REGISTRY, "status_discord_rate_limits_total", "Discord 429 responses, by scope.", ("scope",))
+COMMANDS = Counter(REGISTRY, "status_commands_total", "Commands completed, by command.", ("command",))
+LOOP_LAG = Histogram(REGISTRY, "status_event_loop_lag_seconds", "How late the event loop woke a sleeping task.")
+LOOP_STALLS = Counter(REGISTRY, "status_event_loop_stalls_total", "Callbacks that blocked the event loop past the stall threshold.")
+
+class RateLimitHandler(logging.Handler):
+    """
+    Purpose:
+        Counts the 429s discord.py retries off its log, it doesn't report them any other way.
+        Every 429 logs "We are being rate limited", and a global one then also logs "Global rate
+        limit" in the same step, so a 429 is only counted once the event loop moves on.
+    """
+    def __init__(self, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self.pending = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = str(record.msg)
+        if message.startswith("We are being rate limited"):
+            self.settle()
+            self.pending = "route"
+            try:
+                asyncio.get_running_loop().call_soon(self.settle)
+            except RuntimeError:
+                self.settle()
+        elif message.startswith("Global rate limit") and self.pending != None:
+            self.pending = "global"
+
+    def settle(self) -> None:
+        if self.pending != None:
+            RATE_LIMITS.inc(self.pending)
+            self.pending = None
+
+def install_rate_limit_handler() -> None:
+    logger = logging.getLogger("discord.http")
+    if not any(isinstance(handler, RateLimitHandler) for handler in logger.handlers):
+        logger.addHandler(RateLimitHandler(logging.WARNING))
+
+async def monitor_loop_lag(interval: float = LAG_INTERVAL) -> None:
+    """Samples event loop lag forever, the time a sleep overshoots by."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
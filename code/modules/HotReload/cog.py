@@ -3,6 +3,7 @@
 from discord.ext import commands
 
 import os
+import time
 
 import bot_library as b
 
@@ -10,18 +11,54 @@ class HotReload(commands.Cog):
     def __init__(self, bot) -> None:
         self.bot = bot
 
+    async def reload(self, folder: str) -> float:
+        """
+        Input:
+            :param folder: The cog's folder under modules.
+        Function: Reloads a cog, first handing the warm state of every cog it holds to bot.handoff,
+                where the reloaded cogs pick it up instead of starting cold.
+        Returns: Seconds the reload took.
+        """
+        name = f"modules.{folder}.cog"
+        start = time.perf_counter()
+        exported = []
+        for cog in list(self.bot.cogs.values()):
+            if type(cog).__module__ == name and hasattr(cog, "export_state"):
+                self.bot.handoff[cog.qualified_name] = cog.export_state()
+                exported.append(cog)
+        try:
+            await self.bot.reload_extension(name)
+        finally:
+            for cog in exported:
+                if self.bot.handoff.pop(cog.qualified_name, None) == None:
+                    continue
+                if self.bot.get_cog(cog.qualified_name) is cog:
+                    # The reload failed before unloading it, so the old cog keeps its state.
+                    cog.exported = False
+                else:
+                    b.bot_logger(self.bot.path, self.bot.name, f"Cog {cog.qualified_name} didn't pick up its state after a reload")
+        return time.perf_counter() - start
+
     @commands.command()
     @commands.is_owner()
     async def hotreload(self, ctx: commands.Context, *args) -> None:
-        if args[0] == "all":
-            for folder in os.listdir("modules"):
-                if os.path.exists(os.path.join("modules", folder, "cog.py")):
-                    b.bot_logger(self.bot.path, self.bot.name, f"Cog {folder} has been reloaded")
-                    await self.bot.reload_extension(f"modules.{folder}.cog")
+        if args == () or args[0] == "all":
+            folders = sorted(folder for folder in os.listdir("modules") if os.path.exists(os.path.join("modules", folder, "cog.py")))
         else:
-            for i in args:
-                b.bot_logger(self.bot.path, self.bot.name, f"Cog {i} has been reloaded")
-                await self.bot.reload_extension(f"modules.{i}.cog")
+            folders = args
+
+        timings = []
+        for folder in folders:
+            try:
+                elapsed = await self.reload(folder)
+            except commands.ExtensionError as err:
+                b.bot_logger(self.bot.path, self.bot.name, f"Cog {folder} failed to reload: {err}")
+                timings.append(f"{folder}: failed, {err}")
+                continue
+            b.bot_logger(self.bot.path, self.bot.name, f"Cog {folder} has been reloaded in {elapsed:.3f}s")
+            timings.append(f"{folder}: {elapsed * 1000:.0f}ms")
+
+        await ctx.send("Reloaded:\n" + "\n".join(timings))
 
 async def setup(bot: commands.bot) -> None:
-    await bot.add_cog(HotReload(bot))
\ No newline at end of file
+    await bot.add_cog(HotReload(bot))
@@ -0,0 +1,99 @@
+#!/bin/python3
+
+import asyncio
+import discord
+import io
+import os
+from aiohttp import web
+from discord.ext import commands
+
+import bot_library as b
+import metrics_library as m
+import status_library as s
+
+# Interface the Prometheus endpoint listens on, it's local only unless METRICS_HOST says otherwise.
+METRICS_HOST = "127.0.0.1"
+
+def quantile(histogram: m.Histogram, q: float, *labels) -> str:
+    value = histogram.quantile(q, *labels)
+    if value == None:
+        return "-"
+    return f"≤{value * 1000:.0f}ms" if value != float("inf") else f">{histogram.buckets[-1] * 1000:.0f}ms"
+
+class Metrics(commands.Cog):
+    def __init__(self, bot) -> None:
+        self.bot = bot
+        self.runner = None
+        self.lag = None
+        self.exported = False
+
+    async def cog_load(self) -> None:
+        # A hot reload hands the running endpoint and lag monitor over, so the port is never rebound.
+        state = self.bot.handoff.pop("Metrics", None)
+        if state != None:
+            self.__dict__.update(state)
+            return
+        if not m.REGISTRY.enabled:
+            return
+        m.install_rate_limit_handler()
+        self.lag = asyncio.ensure_future(m.monitor_loop_lag())
+
+        # The Prometheus endpoint, only served when a port is set. Shard processes each take the next port up.
+        port = int(os.getenv("METRICS_PORT", 0))
+        if port > 0:
+            port += self.bot.process
+            app = web.Application()
+            app.router.add_get("/metrics", self.serve)
+            self.runner = web.AppRunner(app)
+            await self.runner.setup()
+            host = os.getenv("METRICS_HOST", METRICS_HOST)
+            await web.TCPSite(self.runner, host, port).start()
+            b.bot_logger(self.bot.path, self.bot.name, f"Serving metrics on http://{host}:{port}/metrics")
+
+    def export_state(self) -> dict:
+        # Kept across a hot reload, see HotReload.
+        self.exported = True
+        return {"runner": self.runner, "lag": self.lag}
+
+    async def cog_unload(self) -> None:
+        if self.exported:
+            return
+        if self.lag != None:
+            self.lag.cancel()
+        if self.runner != None:
+            await self.runner.cleanup()
+
+    async def serve(self, request: web.Request) -> web.Response:
+        return web.Response(body=m.REGISTRY.render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx: commands.Context) -> None:
+        m.COMMANDS.inc(ctx.command.qualified_name)
+
+    # The !metrics command, a summary plus every metric as a file.
+    @commands.command()
+    @commands.is_owner()
+    async def metrics(self, ctx: commands.Context) -> None:
+        """Returns the bot's probe, tracker and Discord metrics."""
+        if not m.REGISTRY.enabled:
+            await ctx.send("Metrics are turned off, set METRICS=1 to turn them on.")
+            return
+
+        description = "Probes:\n"
+        for protocol in s.PROTOCOLS:
+            counts = [int(m.PROBES.get(protocol, result)) for result in ("ok", "timeout", "error")]
+            description += f"{protocol}: {counts[0]} ok, {counts[1]} timeouts, {counts[2]} errors, p50 {quantile(m.PROBE_SECONDS, 0.5, protocol)}, p90 {quantile(m.PROBE_SECONDS, 0.9, protocol)}\n"
+        description += f"""
+        Tracker refreshes: p50 {quantile(m.TRACKER_REFRESH_SECONDS, 0.5)}, p90 {quantile(m.TRACKER_REFRESH_SECONDS, 0.9)}, {int(m.TRACKER_SKIPPED.get())} skipped while busy
+        Discord: {int(sum(m.DISCORD_REQUESTS.values.get(("edit", result), 0) for result in ("ok", "gone", "error")))} edits, {int(sum(m.DISCORD_REQUESTS.values.get(("fetch", result), 0) for result in ("ok", "gone", "error")))} fetches, {int(sum(m.RATE_LIMITS.values.values()))} rate limits
+        Edit queue: {self.bot.dispatcher.depth()} waiting ({self.bot.dispatcher.depth(True)} interactive), {self.bot.dispatcher.coalesced} coalesced
+        Status cache: {self.bot.status_cache.hits} hits, {self.bot.status_cache.misses} misses
+        Event loop lag: p99 {quantile(m.LOOP_LAG, 0.99)}
+        """
+
+        embed = discord.Embed(title="Metrics", description=description, color=0x65bf65)
+        file = discord.File(io.BytesIO(m.REGISTRY.render().encode()), filename="metrics.txt")
+        await ctx.send(embed=embed, file=file)
+
+async def setup(bot: commands.bot) -> None:
+    await bot.add_cog(Metrics(bot))
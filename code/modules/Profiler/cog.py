@@ -0,0 +1,101 @@
+#!/bin/python3
+
+import asyncio
+import discord
+import io
+import os
+import threading
+import time
+from discord.ext import commands
+
+import bot_library as b
+import profile_library as p
+
+class Profiler(commands.Cog):
+    def __init__(self, bot) -> None:
+        self.bot = bot
+        self.stalls = None
+        # The running profile, the task stopping it after PROFILE_MAX_SECONDS, and a profile
+        # that stopped itself and hasn't been sent yet.
+        self.running = None
+        self.timeout = None
+        self.finished = None
+        self.exported = False
+
+    async def cog_load(self) -> None:
+        # A hot reload hands the running stall detector and profile over.
+        state = self.bot.handoff.pop("Profiler", None)
+        if state != None:
+            self.__dict__.update(state)
+            if self.timeout != None:
+                # The old cog's timer would stop the profile behind this one's back.
+                self.timeout.cancel()
+                seconds = float(os.getenv("PROFILE_MAX_SECONDS", p.PROFILE_MAX_SECONDS))
+                self.timeout = asyncio.ensure_future(self.stop_later(seconds, seconds - (time.monotonic() - self.running.started)))
+            return
+
+        # Logs the stack of any callback blocking the event loop for longer than STALL_THRESHOLD, 0 turns it off.
+        threshold = float(os.getenv("STALL_THRESHOLD", p.STALL_THRESHOLD))
+        if threshold > 0:
+            self.stalls = p.StallDetector(lambda message: b.bot_logger(self.bot.path, self.bot.name, message), threshold)
+            self.stalls.start()
+
+    def export_state(self) -> dict:
+        # Kept across a hot reload, see HotReload.
+        self.exported = True
+        return {"stalls": self.stalls, "running": self.running, "timeout": self.timeout, "finished": self.finished}
+
+    async def cog_unload(self) -> None:
+        if self.exported:
+            return
+        if self.stalls != None:
+            self.stalls.stop()
+        if self.running != None:
+            self.finish()
+
+    def finish(self) -> p.SamplingProfiler | p.CProfiler:
+        profile = self.running
+        profile.stop()
+        self.running = None
+        if self.timeout != None and self.timeout is not asyncio.current_task():
+            self.timeout.cancel()
+        self.timeout = None
+        return profile
+
+    async def stop_later(self, seconds: float, remaining: float | None = None) -> None:
+        await asyncio.sleep(remaining if remaining != None else seconds)
+        b.bot_logger(self.bot.path, self.bot.name, f"Profile stopped after {seconds:.0f}s, !profile stop sends its summary")
+        self.finished = self.finish()
+
+    # The !profile command, profiles live traffic until stopped.
+    @commands.command()
+    @commands.is_owner()
+    async def profile(self, ctx: commands.Context, action: str = "stop", kind: str = "sample") -> None:
+        """!profile start [sample|cprofile] starts profiling the event loop, !profile stop sends the summary."""
+        if action == "start":
+            if self.running != None:
+                await ctx.send(f"A {self.running.kind} profile is already running, !profile stop ends it.")
+                return
+            self.finished = None
+            self.running = p.CProfiler() if kind == "cprofile" else p.SamplingProfiler(threading.get_ident())
+            self.running.start()
+            seconds = float(os.getenv("PROFILE_MAX_SECONDS", p.PROFILE_MAX_SECONDS))
+            self.timeout = asyncio.ensure_future(self.stop_later(seconds))
+            b.bot_logger(self.bot.path, self.bot.name, f"{ctx.author} started a {self.running.kind} profile")
+            await ctx.send(f"Started a {self.running.kind} profile, it stops itself after {seconds:.0f}s.")
+            return
+
+        # A profile that stopped itself is still waiting to be sent.
+        profile = self.finish() if self.running != None else self.finished
+        self.finished = None
+        if profile == None:
+            await ctx.send("No profile is running, !profile start starts one.")
+            return
+
+        summary = await asyncio.to_thread(profile.summary)
+        stalls = f", {self.stalls.stalls} event loop stalls since starting" if self.stalls != None else ""
+        file = discord.File(io.BytesIO(summary.encode()), filename=f"profile-{profile.kind}.txt")
+        await ctx.send(f"{profile.kind} profile of {profile.stopped - profile.started:.1f}s{stalls}.", file=file)
+
+async def setup(bot: commands.bot) -> None:
+    await bot.add_cog(Profiler(bot))
@@ -1,389 +1,249 @@
 #!/bin/python3
 
+import asyncio
 import discord
-import base64
-import re
+import io
+import os
+import time
 from discord.ext import commands
-from mcstatus import JavaServer, BedrockServer
 
 import bot_library as b
+import history_library as h
+import status_library as s
+import tracker_library as t
+import view_library as v
+
+# Maximum concurrent probes across every !statusall.
+STATUSALL_CONCURRENCY = 8
+
+# Shortest time between edits of a !statusall embed while results arrive, in seconds.
+STATUSALL_EDIT_INTERVAL = 1.0
 
 class StatusBot(commands.Cog):
     def __init__(self, bot) -> None:
         self.bot = bot
+        self.exported = False
 
-    async def server_status(self, address: str) -> JavaServer | BedrockServer:
-        # Java
-        java = await JavaServer.async_lookup(address, timeout=0.5)
-        try: 
-            java_status = await java.async_status()
-        except:
-            java_status = None
+        # A hot reload hands the open server list store and the probe limit over.
+        state = bot.handoff.pop("StatusBot", None)
+        if state != None:
+            self.__dict__.update(state)
+        else:
+            self.probes = asyncio.Semaphore(int(os.getenv("STATUSALL_CONCURRENCY", STATUSALL_CONCURRENCY)))
 
-        try: 
-            java_query = await java.async_query()
-        except:
-            java_query = None
+            # Each guild's saved !statusall list, next to the tracked messages.
+            self.server_lists = t.ServerListStore(self.bot.path + "tracker.db")
 
-        # Bedrock
-        bedrock = BedrockServer.lookup(address, timeout=0.5)
-        try:
-            bedrock_status = await bedrock.async_status()
-        except:
-            bedrock_status = None
+    def export_state(self) -> dict:
+        # Kept across a hot reload, see HotReload.
+        self.exported = True
+        return {"probes": self.probes, "server_lists": self.server_lists}
+
+    def cog_unload(self) -> None:
+        if not self.exported:
+            self.server_lists.close()
 
-        return ((java_status, java_query), bedrock_status)
+    async def server_status(self, address: str) -> s.ProbeResult:
+        # Served from the shared status cache, probing only on a miss.
+        return await self.bot.status_cache.get(address)
 
-    async def decode_icon(self, server_icon: str, address: str) -> discord.File:
+    async def decode_icon(self, server_icon: str) -> discord.File:
         """
         Input:
-            :param server_icon:
-        Function: Uses the API to convert mcip into a dictionary, grabs base64 png data and
+            :param server_icon: The base64 favicon string sent by the server, or None.
+        Function: Looks the favicon up in the bot's in-memory icon cache and
                 returns it as a discord.File() object.
-        Returns: discird.File()
+        Returns: discord.File()
         """
+        return discord.File(io.BytesIO(self.bot.icon_cache.get(server_icon)), filename="image.png")
 
-        filename = address.replace(":", "-").replace(".", "-")
-
-        if "data:image/png;base64," in server_icon:
-            try:
-                with open(self.bot.path + f"server-icons/{filename}.png", "wb") as f:
-                    f.write(base64.b64decode(server_icon.split(",")[1]))
-                    f.close()
-                with open(self.bot.path + f"server-icons/{filename}.png", "rb") as f:
-                    picture = discord.File(f, filename="image.png")
-                    f.close()
-            except:
-                with open(self.bot.path + "server-icons/default-64.png", "rb") as f:
-                    picture = discord.File(f, filename="image.png")
-                    f.close()
-        else:
-            with open(self.bot.path + "server-icons/default-64.png", "rb") as f:
-                    picture = discord.File(f, filename="image.png")
-                    f.close()
-
-        return picture
-
-    # The !status command and logging logic.
-    @commands.command()
-    async def status(self, ctx: commands.Context, address) -> None:
-        """Returns status data collected from the server."""
+    async def respond(self, ctx: commands.Context, address: str, view) -> None:
+        """
+        Input:
+            :param address: The server address.
+            :param view: The view_library function rendering the embed.
+        Function: Renders the cached snapshot of a server with a view, and sends it with the server's icon.
+        Returns: None
+        """
         channel = ctx.guild.name
         author = ctx.author
         content = ctx.message.content
 
         self.bot.log(channel, author, content)
 
-        # Init variables
-        ((java_status, java_query), bedrock_status) = await self.server_status(address)
-
-        # Logic for the server-icon.
-        if java_status != None and "favicon" in java_status.raw.keys():
-            file = await self.decode_icon(java_status.favicon, address)
-        else:
-            file = await self.decode_icon("None", address)
-
-        image = f"attachment://image.png"
-
-
-        # Logic to send the Java Server status
-        if java_query != None:
-            title = f"Java Server: {address}"
-            description = f"""{re.sub('[§][a-z0-9]','',java_query.motd)}
-            Players: {java_query.players.online}/{java_query.players.max}
-            {java_query.software.brand}: {java_query.software.version}
-            """
-
-            # Add Colour
-            color = 0x65bf65
-
-            # Log the output
-            self.bot.log(channel, self.bot.user, description)
-            #self.json_log(java_status.raw, channel, "java")
-
-        elif java_status != None:
-            title = f"Java Server: {address}"
-            description = f"""{re.sub('[§][a-z0-9]','',java_status.description)}
-            Players: {java_status.players.online}/{java_status.players.max}
-            Version: {java_status.version.name}
-            """
+        snapshot = (await self.server_status(address)).snapshot()
+        embed = view(address, snapshot)
 
-            # Add Colour
-            color = 0x65bf65
+        # Log the output
+        self.bot.log(channel, self.bot.user, embed.description)
 
-            # Log the output
-            self.bot.log(channel, self.bot.user, description)
-            #self.json_log(java_status.raw, channel, "java")
+        await ctx.send(embed=embed, file=await self.decode_icon(snapshot.favicon))
 
-        else:
-            # Response for a Bedrock server
-            if bedrock_status != None:
-                title = f"Bedrock Server: {address}"
-                description = f"""{re.sub('[§][a-z0-9]','',bedrock_status.motd)}
-                {re.sub('[§][a-z0-9]','',bedrock_status.map)}
-                Players: {bedrock_status.players_online}/{bedrock_status.players_max}
-                {bedrock_status.version.brand}: {bedrock_status.version.version}
-                """
-                color = 0xe6d132
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-            else:
-                # Error response
-                title = f"Error:"
-                description = f"Whoops, something went wrong,\ncouldn't reach {address}.\t¯\\\\_(\"/)\_/¯"
-                color = 0xbf0f0f
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-
-        # Output Discord Embed object
-        embed = discord.Embed(title=title, description=description, color=color)
-        embed.set_image(url=image)
+    # The !status command and logging logic.
+    @commands.command()
+    async def status(self, ctx: commands.Context, address) -> None:
+        """Returns status data collected from the server."""
+        await self.respond(ctx, address, v.status_embed)
 
-        await ctx.send(embed=embed, file=file)
-    
     # The !players command and logging logic.
     @commands.command()
     async def players(self, ctx: commands.Context, address) -> None:
         """Returns player data collected from the server."""
-        channel = ctx.guild.name
-        author = ctx.author
-        content = ctx.message.content
-
-        self.bot.log(channel, author, content)
+        await self.respond(ctx, address, v.players_embed)
 
-        # Init variables
-        ((java_status, java_query), bedrock_status) = await self.server_status(address)
-
-        # Logic for the server-icon.
-        if java_status != None and "favicon" in java_status.raw.keys():
-            file = await self.decode_icon(java_status.favicon, address)
-        else:
-            file = await self.decode_icon("None", address)
-
-        image = f"attachment://image.png"
-
-        # Logic to list Java players
-        if java_query != None:
-            if java_query.players.online > 0:
-                # Initializing the title and description
-                title = f"Java Server: {address}"
-                description = "Players:\n"
-
-                # Add Players to description
-                description += ", ".join(java_query.players.names)
-
-                # Add Colour
-                color = 0x65bf65
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-                #self.json_log(java_status.raw, channel, "java")
-            else:
-                title = f"Java Server: {address}"
-                description = "No players online."
-                color = 0xe6d132
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-                #self.json_log(java_status.raw, channel, "java")
-
-        elif java_status != None:
-            if java_status.players.online > 0:
-                # Initializing the title and description
-                title = f"Java Server: {address}"
-                description = "Players:\n"
-
-                # Add Players to description
-                description += ", ".join(player.name for player in java_status.players.sample)
-
-                # Add Colour
-                color = 0x65bf65
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-                #self.json_log(java_status.raw, channel, "java")
+    # The !plugins command and logging logic.
+    @commands.command()
+    async def plugins(self, ctx: commands.Context, address) -> None:
+        """Returns plugin data collected from the server."""
+        await self.respond(ctx, address, v.plugins_embed)
 
-            else:
-                title = f"Java Server: {address}"
-                description = "No players online."
-                color = 0xe6d132
+    # The !mods command and logging logic.
+    @commands.command()
+    async def mods(self, ctx: commands.Context, address: str) -> None:
+        """Returns mod data collected from the server."""
+        await self.respond(ctx, address, v.mods_embed)
 
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-                #self.json_log(java_status.raw, channel, "java")
+    # The !info command and logging logic.
+    @commands.command()
+    async def info(self, ctx: commands.Context, address: str) -> None:
+        """Returns everything collected from the server in one embed."""
+        await self.respond(ctx, address, v.info_embed)
 
-        else:
-            # Response for a Bedrock server
-            if bedrock_status != None:
-                if bedrock_status.players_online > 0:
-                    # Initializing the title and description
-                    title = f"Bedrock Server: {address}"
-                    description = f"Players: {bedrock_status.players_online}/{bedrock_status.players_max}\n"
-                    color = 0x65bf65
-
-                else:
-                    title = f"Bedrock Server: {address}"
-                    description = "No players online."
-                    color = 0xe6d132
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-            else:
-                # Error response
-                title = f"Error:"
-                description = f"Whoops, something went wrong,\ncouldn't reach {address}.\t¯\\\\_(\"/)\_/¯"
-                color = 0xbf0f0f
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-
-        # Output Discord Embed object
-        embed = discord.Embed(title=title, description=description, color=color)
-        embed.set_image(url=image)
+    async def bounded_snapshot(self, address: str) -> tuple:
+        async with self.probes:
+            return (address, (await self.server_status(address)).snapshot())
 
-        await ctx.send(embed=embed, file=file)
-    
-    # The !plugins command and logging logic.
+    # The !statusall command and logging logic.
     @commands.command()
-    async def plugins(self, ctx: commands.Context, address) -> None:
-        """Returns plugin data collected from the server."""
+    async def statusall(self, ctx: commands.Context, *addresses: str) -> None:
+        """Returns a one line status of each server given, or of the guild's saved list."""
         channel = ctx.guild.name
         author = ctx.author
         content = ctx.message.content
 
         self.bot.log(channel, author, content)
 
-        # Init variables
-        ((java_status, java_query), bedrock_status) = await self.server_status(address)
-
-        # Logic for the server-icon.
-        if java_status != None and "favicon" in java_status.raw.keys():
-            file = await self.decode_icon(java_status.favicon, address)
-        else:
-            file = await self.decode_icon("None", address)
-
-        image = f"attachment://image.png"
-
-        if java_query != None:
-            # Logic to list Java plugins
-            if java_query.software.plugins != []:
-                # Initializing the title and description
-                title = f"Java Server: {address}"
-                description = "Plugins:\n"
-
-                # Add Plugin to descriptions
-                for i in java_query.software.plugins:
-                    description += f"{i}, "
-
-                # Add Colour
-                color = 0x65bf65
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-                #self.json_log(java_status.raw, channel, "java")
-            else:
-                title = f"Java Server: {address}"
-                description = "No plugins detected."
-                color = 0xe6d132
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-                #self.json_log(java_status.raw, channel, "java")
-        else:
-            # Response for a Bedrock server
-            if bedrock_status != None:
-                title = f"Bedrock Server: {address}"
-                description = "No plugins detected."
-                color = 0xe6d132
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-            else:
-                # Error response
-                title = f"Error:"
-                description = f"Whoops, something went wrong,\ncouldn't reach {address}.\t¯\\\\_(\"/)\_/¯"
-                color = 0xbf0f0f
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-
-        # Output Discord Embed object
-        embed = discord.Embed(title=title, description=description, color=color)
-        embed.set_image(url=image)
+        # Same server given twice is probed and listed once.
+        keys = set()
+        unique = []
+        for address in addresses if addresses != () else self.server_lists.get(ctx.guild.id):
+            if self.bot.status_cache.key(address) not in keys:
+                keys.add(self.bot.status_cache.key(address))
+                unique.append(address)
 
-        await ctx.send(embed=embed, file=file)
+        if unique == []:
+            description = "No servers given and none saved,\nsave some with !servers add server-ip ..."
+            self.bot.log(channel, self.bot.user, description)
+            await ctx.send(embed=discord.Embed(title="Error:", description=description, color=v.RED))
+            return
+
+        # Show every server as checking straight away, then fill each in as it answers.
+        entries = {address: None for address in unique[:self.server_lists.maxsize]}
+        message = await ctx.send(embed=v.summary_embed(list(entries.items())))
+        last_edit = time.monotonic()
+        pending = [asyncio.ensure_future(self.bounded_snapshot(address)) for address in entries]
+        try:
+            for done in asyncio.as_completed(pending):
+                (address, snapshot) = await done
+                entries[address] = snapshot
+                if None in entries.values() and time.monotonic() - last_edit >= STATUSALL_EDIT_INTERVAL:
+                    # Someone is waiting on it, so it goes ahead of tracker edits in the channel's queue.
+                    await self.bot.dispatcher.edit(message, interactive=True, embed=v.summary_embed(list(entries.items())))
+                    last_edit = time.monotonic()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        embed = v.summary_embed(list(entries.items()))
+        if len(unique) > len(entries):
+            embed.set_footer(text=f"Only the first {len(entries)} of {len(unique)} servers are shown.")
 
-    # The !mods command and logging logic.
+        # Log the output
+        self.bot.log(channel, self.bot.user, embed.description)
+
+        await self.bot.dispatcher.edit(message, interactive=True, embed=embed)
+
+    # The !servers command, the guild's saved !statusall list.
+    @commands.group(invoke_without_command=True)
+    async def servers(self, ctx: commands.Context) -> None:
+        """Lists the servers saved for !statusall, !servers add|remove|clear changes them."""
+        self.bot.log(ctx.guild.name, ctx.author, ctx.message.content)
+        saved = self.server_lists.get(ctx.guild.id)
+        description = "\n".join(saved) if saved != [] else "No servers saved, add some with !servers add server-ip ..."
+        self.bot.log(ctx.guild.name, self.bot.user, description)
+        await ctx.send(embed=discord.Embed(title=f"Saved servers: {len(saved)}/{self.server_lists.maxsize}", description=description, color=v.GREEN))
+
+    @servers.command(name="add")
+    @commands.has_guild_permissions(manage_guild=True)
+    async def servers_add(self, ctx: commands.Context, *addresses: str) -> None:
+        """Saves servers to the guild's !statusall list."""
+        self.bot.log(ctx.guild.name, ctx.author, ctx.message.content)
+        # Saved the way the status cache keys them, so the same server typed differently is saved once.
+        saved = [self.bot.status_cache.key(address) for address in self.server_lists.get(ctx.guild.id)]
+        added = self.server_lists.add(ctx.guild.id, [self.bot.status_cache.key(address) for address in addresses if self.bot.status_cache.key(address) not in saved])
+        skipped = len(addresses) - len(added)
+        reply = f"Saved {len(added)} servers." + (f" {skipped} were already saved or didn't fit, the list holds {self.server_lists.maxsize}." if skipped > 0 else "")
+        self.bot.log(ctx.guild.name, self.bot.user, reply)
+        await ctx.send(reply)
+
+    @servers.command(name="remove")
+    @commands.has_guild_permissions(manage_guild=True)
+    async def servers_remove(self, ctx: commands.Context, *addresses: str) -> None:
+        """Removes servers from the guild's !statusall list."""
+        self.bot.log(ctx.guild.name, ctx.author, ctx.message.content)
+        keys = [self.bot.status_cache.key(address) for address in addresses]
+        removed = self.server_lists.remove(ctx.guild.id, [address for address in self.server_lists.get(ctx.guild.id) if self.bot.status_cache.key(address) in keys])
+        reply = f"Removed {removed} servers."
+        self.bot.log(ctx.guild.name, self.bot.user, reply)
+        await ctx.send(reply)
+
+    @servers.command(name="clear")
+    @commands.has_guild_permissions(manage_guild=True)
+    async def servers_clear(self, ctx: commands.Context) -> None:
+        """Removes every server from the guild's !statusall list."""
+        self.bot.log(ctx.guild.name, ctx.author, ctx.message.content)
+        removed = self.server_lists.clear(ctx.guild.id)
+        reply = f"Removed {removed} servers."
+        self.bot.log(ctx.guild.name, self.bot.user, reply)
+        await ctx.send(reply)
+
+    # The !history command and logging logic.
     @commands.command()
-    async def mods(self, ctx: commands.Context, address: str) -> None:
-        """Returns mod data collected from the server."""
+    async def history(self, ctx: commands.Context, address: str, span: str = "hours") -> None:
+        """Returns a chart of a tracked server's players and uptime, over hours, days or a year."""
         channel = ctx.guild.name
         author = ctx.author
         content = ctx.message.content
 
         self.bot.log(channel, author, content)
 
-        # Init variables
-        ((java_status, java_query), bedrock_status) = await self.server_status(address)
+        # Served from the recorded history, the server isn't probed.
+        spans = {"hours": (0, "6 hours"), "days": (1, "14 days"), "year": (2, "year")}
+        (tier, label) = spans.get(span.lower(), spans["hours"])
+        points = self.bot.history.points(self.bot.status_cache.key(address), tier)
+        summary = h.summarize(points)
 
-        # Logic for the server-icon.
-        if java_status != None and "favicon" in java_status.raw.keys():
-            file = await self.decode_icon(java_status.favicon, address)
-        else:
-            file = await self.decode_icon("None", address)
-
-        image = f"attachment://image.png"
-
-        if java_status != None:
-            # Logic to list Java mods
-            if "modinfo" in java_status.raw.keys() and java_status.raw["modinfo"]["modList"] != []:
-                # Initializing the title and description
-                title = f"Java Server: {address}"
-                description = "Mods:\n"
-
-                # Add Mods to descriptions
-                for i in java_status.raw["modinfo"]["modList"]:
-                    modid = i["modid"]
-                    version = i["version"]
-                    description += f"{modid}: v{version}, "
-
-                # Add Colour
-                color = 0x65bf65
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-                #self.json_log(java_status.raw, channel, "java")
-            else:
-                title = f"Java Server: {address}"
-                description = "No mods detected."
-                color = 0xe6d132
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-                #self.json_log(java_status.raw, channel, "java")
-        else:
-            # Response for a Bedrock server
-            if bedrock_status != None:
-                title = f"Bedrock Server: {address}"
-                description = "No mods detected."
-                color = 0xe6d132
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-            else:
-                # Error response
-                title = f"Error:"
-                description = f"Whoops, something went wrong,\ncouldn't reach {address}.\t¯\\\\_(\"/)\_/¯"
-                color = 0xbf0f0f
-
-                # Log the output
-                self.bot.log(channel, self.bot.user, description)
-
-        # Output Discord Embed object
+        if summary["samples"] == 0:
+            title = f"Error:"
+            description = f"No history for {address} yet,\nit's recorded while the server is tracked with !track."
+            self.bot.log(channel, self.bot.user, description)
+            await ctx.send(embed=discord.Embed(title=title, description=description, color=0xbf0f0f))
+            return
+
+        title = f"History: {address}"
+        description = f"""Past {label}
+        Uptime: {summary["uptime"] * 100:.1f}%
+        Players: {f'{summary["average"]:.1f} average, {summary["peak"]:.0f} peak' if summary["average"] != None else "None online"}
+        Latency: {f'{summary["latency"]:.0f}ms average' if summary["latency"] != None else "Unknown"}
+        """
+        color = 0x65bf65 if summary["uptime"] >= 0.99 else 0xe6d132
+
+        # Log the output
+        self.bot.log(channel, self.bot.user, description)
+
+        file = discord.File(io.BytesIO(h.render_chart(points)), filename="history.png")
         embed = discord.Embed(title=title, description=description, color=color)
-        embed.set_image(url=image)
+        embed.set_image(url="attachment://history.png")
 
         await ctx.send(embed=embed, file=file)
 
@@ -397,8 +257,10 @@ class StatusBot(commands.Cog):
         content = ctx.message.content
 
         # Init variables
+        profile = self.bot.protocol_profiles.describe(self.bot.status_cache.key(address))
+
         # Java
-        java = await JavaServer.async_lookup(address)
+        java = await self.bot.resolver.java(address)
 
         try:
             java_status = (await java.async_query()).raw
@@ -406,7 +268,8 @@ class StatusBot(commands.Cog):
             java_status = "No Java server detected"
 
         # Bedrock
-        bedrock = BedrockServer.lookup(address)
+        # Resolved through the bot's cache, like every other lookup.
+        bedrock = await self.bot.resolver.bedrock(address)
         try:
             bedrock_status = await bedrock.async_status()
         except:
@@ -424,13 +287,15 @@ class StatusBot(commands.Cog):
         Version: {bedrock_status.version.version}
         Server Type: {bedrock_status.version.brand}
         Protocol: {bedrock_status.version.protocol}
+        Protocol Profile:
+        {profile}
         """
 
         # Log the output
         self.bot.log(channel, author, content)
         self.bot.log(channel, self.bot.user, description)
 
-        await ctx.send("Info dumped to the log.")
+        await ctx.send(f"Info dumped to the log.\n```{profile}```")
 
 async def setup(bot: commands.bot) -> None:
     await bot.add_cog(StatusBot(bot))
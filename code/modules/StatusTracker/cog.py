@@ -1,143 +1,62 @@
 #!/bin/python3
 
 import discord
-import base64
-import re
+import io
 import json
 import os
+import time
+import asyncio
+import hashlib
 from discord.ext import commands, tasks
-from mcstatus import JavaServer, BedrockServer
 
 import bot_library as b
+import metrics_library as m
+import shard_library as sh
+import status_library as s
+import tracker_library as t
+import view_library as v
 
 path = "/status_bot/"
 
-async def server_status(address: str) -> JavaServer | BedrockServer:
-    # Java
-    java = await JavaServer.async_lookup(address, timeout=0.5)
-    try: 
-        java_status = await java.async_status()
-    except:
-        java_status = None
-
-    try: 
-        java_query = await java.async_query()
-    except:
-        java_query = None
-
-    # Bedrock
-    bedrock = BedrockServer.lookup(address, timeout=0.5)
-    try:
-        bedrock_status = await bedrock.async_status()
-    except:
-        bedrock_status = None
-
-    return ((java_status, java_query), bedrock_status)
-
-async def decode_icon(server_icon: str, address: str) -> discord.File:
-    """
-    Input:
-        :param server_icon:
-    Function: Uses the API to convert mcip into a dictionary, grabs base64 png data and
-            returns it as a discord.File() object.
-    Returns: discird.File()
-    """
-
-    filename = address.replace(":", "-").replace(".", "-")
-
-    if "data:image/png;base64," in server_icon:
-        try:
-            with open(path + f"server-icons/{filename}.png", "wb") as f:
-                f.write(base64.b64decode(server_icon.split(",")[1]))
-                f.close()
-            with open(path + f"server-icons/{filename}.png", "rb") as f:
-                picture = discord.File(f, filename="image.png")
-                f.close()
-        except:
-            with open(path + "server-icons/default-64.png", "rb") as f:
-                picture = discord.File(f, filename="image.png")
-                f.close()
-    else:
-        with open(path + "server-icons/default-64.png", "rb") as f:
-                picture = discord.File(f, filename="image.png")
-                f.close()
-
-    return picture
-
-async def status(address) -> discord.Embed | discord.File:
-        # Init variables
-        ((java_status, java_query), bedrock_status) = await server_status(address)
-
-        # Logic for the server-icon.
-        if java_status != None and "favicon" in java_status.raw.keys():
-            file = await decode_icon(java_status.favicon, address)
-        else:
-            file = await decode_icon("None", address)
-
-        image = f"attachment://image.png"
-
-
-        # Logic to send the Java Server status
-        if java_query != None:
-            title = f"Java Server: {address}"
-            description = f"""{re.sub('[§][a-z0-9]','',java_query.motd)}
-            Players: {java_query.players.online}/{java_query.players.max}
-            {java_query.software.brand}: {java_query.software.version}
-            """
+# Maximum number of tracked messages a tracker cycle fetches, or the startup revalidation probes, at once.
+# Edits are bounded by the dispatcher.
+TRACKER_CONCURRENCY = 10
 
-            # Add Colour
-            color = 0x65bf65
+# Seconds after which an unchanged tracked message is edited anyway, 0 to never.
+TRACKER_HEARTBEAT = 0
 
-        elif java_status != None:
-            title = f"Java Server: {address}"
-            description = f"""{re.sub('[§][a-z0-9]','',java_status.description)}
-            Players: {java_status.players.online}/{java_status.players.max}
-            Version: {java_status.version.name}
-            """
+# Seconds after a Refresh button press during which more presses on that message are answered with its result.
+REFRESH_INTERVAL = 15
 
-            # Add Colour
-            color = 0x65bf65
-
-        else:
-            # Response for a Bedrock server
-            if bedrock_status != None:
-                title = f"Bedrock Server: {address}"
-                description = f"""{re.sub('[§][a-z0-9]','',bedrock_status.motd)}
-                {re.sub('[§][a-z0-9]','',bedrock_status.map)}
-                Players: {bedrock_status.players_online}/{bedrock_status.players_max}
-                {bedrock_status.version.brand}: {bedrock_status.version.version}
-                """
-                color = 0xe6d132
-            else:
-                # Error response
-                title = f"Minecraft Server: {address}"
-                description = f"Whoops, something went wrong,\ncouldn't reach {address}.\t¯\\\\_(\"/)\_/¯"
-                color = 0xbf0f0f
+async def server_status(bot: commands.Bot, address: str, background: bool = False, stale: bool = True) -> s.ProbeResult:
+    # Served from the shared status cache, probing only on a miss.
+    return await bot.status_cache.get(address, background=background, stale=stale)
 
-        # Output Discord Embed object
-        embed = discord.Embed(title=title, description=description, color=color)
-        embed.set_image(url=image)
-
-        return (embed, file)
+async def decode_icon(bot: commands.Bot, server_icon: str) -> discord.File:
+    """
+    Input:
+        :param server_icon: The base64 favicon string sent by the server.
+    Function: Looks the favicon up in the bot's in-memory icon cache and
+            returns it as a discord.File() object.
+    Returns: discord.File()
+    """
+    return discord.File(io.BytesIO(bot.icon_cache.get(server_icon)), filename="image.png")
 
-async def save_message(channel_id, message_id) -> None:
-    filename = path + "/messages.json"
-    if not os.path.exists(filename):
-        with open(filename, "w") as f:
-            f.write("{\"messages\":[" + f"{channel_id}-{message_id}" + "]}")
-            f.close()
+async def status(bot: commands.Bot, address) -> discord.Embed | discord.File:
+    return await build_status(bot, address, await server_status(bot, address))
 
-    else:
-        with open(filename) as json_file:
-            messages = json.load(json_file)
-            json_file.close()
+async def build_status(bot: commands.Bot, address: str, result: s.ProbeResult) -> discord.Embed | discord.File:
+    return (build_embed(address, result), await decode_icon(bot, result.snapshot().favicon))
 
-        new_messages = messages
-        new_messages["messages"].append(f"{channel_id}-{message_id}")
+def fingerprint(embed: discord.Embed, icon: str | None) -> str:
+    # Hashes everything a tracked message shows, ignoring the embed timestamp.
+    content = embed.to_dict()
+    content.pop("timestamp", None)
+    return hashlib.sha256((json.dumps(content, sort_keys=True) + s.IconCache.key(icon or "")).encode()).hexdigest()
 
-        with open(filename, "w") as outfile:
-            json.dump(new_messages, outfile, indent = 4)
-            outfile.close()
+def build_embed(address: str, result: s.ProbeResult) -> discord.Embed:
+    # The !status embed, titled so the address can always be read back out of it.
+    return v.status_embed(address, result.snapshot(), error_title=f"Minecraft Server: {address}")
 
 class PersistentView(discord.ui.View):
     def __init__(self) -> None:
@@ -145,65 +64,333 @@ class PersistentView(discord.ui.View):
 
     @discord.ui.button(label='Refresh', style=discord.ButtonStyle.gray, custom_id='persistent_view:refresh')
     async def refresh(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
-        await interaction.response.send_message("Refreshed!", ephemeral=True)
+        # Acknowledge first, so a slow probe never times the interaction out.
+        await interaction.response.defer(ephemeral=True, thinking=True)
         msg = interaction.message
-        address = msg.embeds.pop().title.split("Server: ")[1]
-        (embed, file) = await status(address)
-        await msg.edit(embed=embed, attachments=[file])
+        address = msg.embeds[0].title.split("Server: ")[1]
+        try:
+            age = await interaction.client.get_cog("StatusTracker").refresh_clicked(msg, address)
+        except Exception as err:
+            b.bot_logger(interaction.client.path, interaction.client.name, f"Refresh of {msg.channel.id}-{msg.id} failed: {err}")
+            await interaction.followup.send("Couldn't refresh, try again later.", ephemeral=True)
+            return
+        await interaction.followup.send("Refreshed!" if age < 1 else f"Refreshed {age:.0f}s ago!", ephemeral=True)
 
 class StatusTracker(commands.Cog):
     def __init__(self, bot) -> None:
         self.bot = bot
+        self.concurrency = int(os.getenv("TRACKER_CONCURRENCY", TRACKER_CONCURRENCY))
+        self.heartbeat = float(os.getenv("TRACKER_HEARTBEAT", TRACKER_HEARTBEAT))
+        self.refresh_interval = float(os.getenv("REFRESH_INTERVAL", REFRESH_INTERVAL))
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+        # Whether export_state() handed this cog's state on, so unloading mustn't tear it down.
+        self.exported = False
+
+        # A hot reload hands the running state over, so nothing is reloaded from disk or reprobed.
+        state = bot.handoff.pop("StatusTracker", None)
+        if state != None:
+            self.__dict__.update(state)
+        else:
+            # The fingerprint and time of the last edit, keyed by message id.
+            self.fingerprints = {}
+
+            # The start time and task of each message's latest Refresh button press, keyed by message id.
+            self.clicks = {}
+
+            # Tracked messages, imported from messages.json the first time the store is opened.
+            self.store = t.TrackerStore(path + "tracker.db")
+            migrated = self.store.migrate_json(path + "messages.json", self.guild_of)
+            if migrated > 0:
+                b.bot_logger(self.bot.path, self.bot.name, f"Migrated {migrated} tracked messages from messages.json")
+
+            # Refreshes are spread over each message's interval, a few messages every tick.
+            self.schedule = t.TrackerSchedule(
+                tick=float(os.getenv("TRACKER_TICK", t.TRACKER_TICK)),
+                default_interval=float(os.getenv("TRACKER_INTERVAL", t.TRACKER_INTERVAL)),
+            )
+            # In sharded mode messages in other processes' guilds are left to them.
+            for row in self.store.all():
+                if row.guild_id == None or self.owns(row):
+                    self.schedule.add(row)
+            self.last_tick = None
+            self.refreshing = set()
+            self.refreshes = set()
+
+        m.REGISTRY.callback("status_tracker_scheduled", "Tracked messages scheduled in this process.", "gauge", lambda: len(self.schedule))
+        m.REGISTRY.callback("status_tracker_refreshing", "Tracked messages with a refresh in progress.", "gauge", lambda: len(self.refreshing))
+
+        self.task.change_interval(seconds=self.schedule.tick)
         self.task.start()
 
-    @tasks.loop(minutes=1)
+    def export_state(self) -> dict:
+        """
+        Input: None
+        Function: Hands the registry, schedule, edit fingerprints and refreshes in flight to the cog
+                replacing this one on a hot reload. Refreshes in flight finish on this cog, sharing them.
+        Returns: The state, picked up from bot.handoff by the next StatusTracker.
+        """
+        self.exported = True
+        names = ("fingerprints", "clicks", "store", "schedule", "last_tick", "refreshing", "refreshes")
+        return {name: getattr(self, name) for name in names}
+
+    def export_fingerprints(self) -> dict:
+        # Saved across restarts, so messages showing the latest status aren't all edited again.
+        return {str(message_id): digest for (message_id, (digest, edited)) in self.fingerprints.items()}
+
+    def restore_fingerprints(self, fingerprints: dict) -> None:
+        now = time.monotonic()
+        for (message_id, digest) in fingerprints.items():
+            self.fingerprints.setdefault(int(message_id), (digest, now))
+
+    def cog_unload(self) -> None:
+        self.task.cancel()
+        if self.exported:
+            return
+        for refresh in self.refreshes:
+            refresh.cancel()
+        for (start, click) in self.clicks.values():
+            click.cancel()
+        self.store.close()
+
+    def guild_of(self, channel_id: int) -> int | None:
+        channel = self.bot.get_channel(channel_id)
+        return channel.guild.id if getattr(channel, "guild", None) != None else None
+
+    def owns(self, row: t.TrackedMessage) -> bool:
+        # Whether this process refreshes a tracked message, always when the bot isn't sharded.
+        if self.bot.shard_ids == None:
+            return True
+        if row.guild_id != None:
+            return sh.shard_of(row.guild_id, self.bot.shard_count) in self.bot.shard_ids
+        # Entries migrated without a guild belong to whichever process can see their channel.
+        return self.bot.get_channel(row.channel_id) != None
+
+    def partial_message(self, channel_id: int, message_id: int) -> discord.PartialMessage:
+        # A handle that can be edited without fetching the message first.
+        return self.bot.get_partial_messageable(channel_id).get_partial_message(message_id)
+
+    def untrack(self, message_id: int) -> None:
+        self.store.remove(message_id)
+        self.schedule.remove(message_id)
+        self.fingerprints.pop(message_id, None)
+
+    async def fetch_tracked(self, row: t.TrackedMessage) -> tuple | str:
+        """
+        Input:
+            :param row: The tracked message's registry entry.
+        Function: Fetches a tracked message and reads the address back out of its embed.
+        Returns: (message, address), "gone" if the message or its channel no longer exists,
+                or "failed" if it couldn't be fetched this time.
+        """
+        async with self.semaphore:
+            try:
+                # Fetched by channel id, a channel not cached yet at startup isn't a deleted one.
+                message = await self.partial_message(row.channel_id, row.message_id).fetch()
+            except (discord.NotFound, discord.Forbidden):
+                m.DISCORD_REQUESTS.inc("fetch", "gone")
+                return "gone"
+            except Exception as err:
+                m.DISCORD_REQUESTS.inc("fetch", "error")
+                b.bot_logger(self.bot.path, self.bot.name, f"Tracker failed to fetch {row.channel_id}-{row.message_id}: {err}")
+                return "failed"
+        m.DISCORD_REQUESTS.inc("fetch", "ok")
+        try:
+            return (message, message.embeds[0].title.split("Server: ")[1])
+        except (IndexError, AttributeError):
+            # The message no longer holds a status embed, so there's nothing left to track.
+            return "gone"
+
+    async def edit_tracked(self, row: t.TrackedMessage, message: discord.PartialMessage, result: s.ProbeResult, interactive: bool = False) -> str:
+        """
+        Input:
+            :param row: The tracked message's registry entry.
+            :param message: The message to edit.
+            :param result: The probe result to render.
+            :param interactive: Whether a user is waiting on the edit.
+        Function: Edits the tracked message with the latest status, unless it is unchanged.
+        Returns: "edited", "unchanged", "failed", or "gone" if the message no longer exists.
+        """
+        embed = build_embed(row.address, result)
+        icon = result.snapshot().favicon
+        digest = fingerprint(embed, icon)
+
+        # Skip the edit if nothing changed since the last one, unless a heartbeat is due.
+        now = time.monotonic()
+        previous = self.fingerprints.get(row.message_id)
+        if previous != None and previous[0] == digest and (self.heartbeat <= 0 or now - previous[1] < self.heartbeat):
+            return "unchanged"
+
+        # The dispatcher rate limits each channel and bounds the edits in flight.
+        try:
+            file = await decode_icon(self.bot, icon)
+            await self.bot.dispatcher.edit(message, interactive=interactive, embed=embed, attachments=[file])
+            self.fingerprints[row.message_id] = (digest, now)
+            m.DISCORD_REQUESTS.inc("edit", "ok")
+            return "edited"
+        except (discord.NotFound, discord.Forbidden):
+            # The message or its channel is gone, or we can no longer see it.
+            m.DISCORD_REQUESTS.inc("edit", "gone")
+            return "gone"
+        except Exception as err:
+            m.DISCORD_REQUESTS.inc("edit", "error")
+            b.bot_logger(self.bot.path, self.bot.name, f"Tracker failed to edit {row.channel_id}-{row.message_id}: {err}")
+            return "failed"
+
+    async def refresh_clicked(self, message: discord.Message, address: str) -> float:
+        """
+        Input:
+            :param message: The tracked message whose Refresh button was pressed.
+            :param address: The server address it shows.
+        Function: Refreshes the message, unless a press on it is already in flight or finished
+                within the refresh interval, then that press's result is waited on instead.
+        Returns: Seconds since the refresh the press was answered with started.
+        """
+        now = time.monotonic()
+        click = self.clicks.get(message.id)
+        if click == None or (click[1].done() and now - click[0] >= self.refresh_interval):
+            row = self.store.get(message.id) or t.TrackedMessage(message.id, message.channel.id, None, address, None)
+            click = self.clicks[message.id] = (now, asyncio.ensure_future(self.click(row._replace(address=address), message)))
+            # Forget the press once it can no longer answer others.
+            asyncio.get_running_loop().call_later(self.refresh_interval, self.forget_click, message.id, click)
+        await asyncio.shield(click[1])
+        return now - click[0]
+
+    def forget_click(self, message_id: int, click: tuple) -> None:
+        if self.clicks.get(message_id) is click:
+            if click[1].done():
+                del self.clicks[message_id]
+            else:
+                click[1].add_done_callback(lambda task: self.forget_click(message_id, click))
+
+    async def click(self, row: t.TrackedMessage, message: discord.Message) -> None:
+        result = await server_status(self.bot, row.address)
+        if await self.edit_tracked(row, message, result, interactive=True) == "gone":
+            self.untrack(row.message_id)
+
+    async def refresh(self, rows: list, fresh: bool = False) -> None:
+        """
+        Input:
+            :param rows: The tracked messages that are due.
+            :param fresh: Whether to wait for new probes of addresses restored from the last run,
+                instead of showing the restored status while they're reprobed.
+        Function: Probes each address once and edits every due message tracking it.
+        Returns: None
+        """
+        start = time.perf_counter()
+        messages = {}
+        gone = []
+
+        # Older entries don't store their address, so fetch them once and upgrade them.
+        legacy = [row for row in rows if row.address == None]
+        rows = [row for row in rows if row.address != None]
+        fetched = await asyncio.gather(*[self.fetch_tracked(row) for row in legacy])
+        for (row, item) in zip(legacy, fetched):
+            if item == "gone":
+                gone.append(row)
+            elif item != "failed":
+                (messages[row.message_id], address) = item
+                self.store.set_address(row.message_id, address)
+                rows.append(row._replace(address=address))
+                self.schedule.add(rows[-1])
+
+        # Group the tracked messages by address, so each server is probed once per refresh.
+        tracked = {}
+        for row in rows:
+            message = messages.get(row.message_id) or self.partial_message(row.channel_id, row.message_id)
+            tracked.setdefault(row.address, []).append((row, message))
+
+        addresses = list(tracked.keys())
+        results = await asyncio.gather(*[self.probe(address, fresh) for address in addresses])
+        for (address, result) in zip(addresses, results):
+            # Restored results were recorded by the run that probed them, and a result served again
+            # from the cache or during a back off is skipped by its probe time.
+            if result.restored == None:
+                self.bot.history.record(self.bot.status_cache.key(address), result.snapshot(), result.probed)
+
+        jobs = [(row, message, result) for (address, result) in zip(addresses, results) for (row, message) in tracked[address]]
+        outcomes = await asyncio.gather(*[self.edit_tracked(row, message, result) for (row, message, result) in jobs])
+        gone += [job[0] for (job, outcome) in zip(jobs, outcomes) if outcome == "gone"]
+
+        # Single-row deletes, so messages tracked during the refresh are never touched.
+        for row in gone:
+            self.untrack(row.message_id)
+
+        if m.REGISTRY.enabled:
+            m.TRACKER_REFRESH_SECONDS.observe(time.perf_counter() - start)
+            for outcome in outcomes:
+                m.TRACKER_MESSAGES.inc(outcome)
+
+        b.bot_logger(self.bot.path, self.bot.name, f"Tracker refreshed {outcomes.count('edited')}/{len(rows) + len(gone) - outcomes.count('gone')} messages ({outcomes.count('unchanged')} unchanged, {len(gone)} gone) for {len(addresses)} addresses in {time.perf_counter() - start:.2f}s")
+
+    async def probe(self, address: str, fresh: bool) -> s.ProbeResult:
+        if not fresh:
+            return await server_status(self.bot, address, background=True)
+        async with self.semaphore:
+            return await server_status(self.bot, address, background=True, stale=False)
+
+    async def run_refresh(self, rows: list, fresh: bool = False) -> None:
+        try:
+            await self.refresh(rows, fresh)
+        finally:
+            self.refreshing.difference_update(row.message_id for row in rows)
+
+    @tasks.loop(seconds=t.TRACKER_TICK)
     async def task(self):
-        filename = path + "/messages.json"
-        if not os.path.exists(filename):
-            with open(filename, "w") as f:
-                f.write("{\"messages\":[]}")
-                f.close()
-
-        with open(filename) as json_file:
-            messages = json.load(json_file)
-            json_file.close()
-
-        if messages["messages"] != []:
-            new_messages = messages
-
-            for i in new_messages["messages"]:
-                try:
-                    ids = i.split("-")
-                    channel = self.bot.get_channel(int(ids[0]))
-                    message = await channel.fetch_message(int(ids[1]))
-                    address = message.embeds.pop().title.split("Server: ")[1]
-                    (embed, file) = await status(address)
-                    await message.edit(embed=embed, attachments=[file])
-                except:
-                    new_messages["messages"].remove(i)
-
-            with open(filename, "w") as outfile:
-                json.dump(new_messages, outfile, indent = 4)
-                outfile.close()
+        tick = self.schedule.current_tick()
+        due = {}
+        # The first tick after starting revalidates every tracked message at once, they may have been
+        # out of date for as long as the bot was down. Restored fingerprints skip edits that change nothing.
+        fresh = self.last_tick == None
+        if fresh:
+            due = {row.message_id: row for row in self.schedule}
+        else:
+            # Catch up on any ticks missed since the last run, but never more than one full interval.
+            first = max(self.last_tick + 1, tick - self.schedule.max_slots() + 1)
+            for i in range(first, tick + 1):
+                for row in self.schedule.due(i):
+                    due[row.message_id] = row
+        self.last_tick = tick
+
+        # Messages still being refreshed from an earlier tick are skipped, so overruns never stack.
+        rows = [row for row in due.values() if row.message_id not in self.refreshing and self.owns(row)]
+        if m.REGISTRY.enabled:
+            m.TRACKER_SKIPPED.inc(value=len([row for row in due.values() if row.message_id in self.refreshing]))
+        if rows == []:
+            return
+        self.refreshing.update(row.message_id for row in rows)
+
+        # Each tick's refresh runs in the background, so a slow address doesn't delay the next tick.
+        refresh = asyncio.ensure_future(self.run_refresh(rows, fresh))
+        self.refreshes.add(refresh)
+        refresh.add_done_callback(self.refreshes.discard)
+
+    @task.before_loop
+    async def before_task(self) -> None:
+        # Extensions load before the bot connects, so wait until it can reach the tracked messages.
+        await self.bot.wait_until_ready()
+        # And for the state saved by the last run, so the first refresh can use it.
+        if self.bot.warm != None:
+            await self.bot.warm
 
     @commands.command()
-    async def track(self, ctx: commands.Context, address) -> None:
-        """Creates an embed to check server status"""
+    async def track(self, ctx: commands.Context, address, interval: int = None) -> None:
+        """Creates an embed to check server status, refreshed every interval minutes"""
         channel = ctx.guild.name
         author = ctx.author
         content = ctx.message.content
 
         self.bot.log(channel, author, content)
 
-        (embed, file) = await status(address)
+        (embed, file) = await status(self.bot, address)
 
         # Log the output
         self.bot.log(channel, self.bot.user, embed.description)
 
         await ctx.message.delete()
-        channel_id = ctx.channel.id
         message_id = (await ctx.send(embed=embed, file=file, view=PersistentView())).id
-        await save_message(channel_id, message_id)
+        row = self.store.add(ctx.channel.id, message_id, address, ctx.guild.id, interval * 60 if interval != None and interval > 0 else None)
+        self.schedule.add(row)
 
 
 
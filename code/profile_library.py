@@ -0,0 +1,178 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Profiling Library
+# Purpose: Find what blocks the status_bot's event loop, while it runs.
+# Date: 18OCTOBER2026
+#--------------------------------------------------------------------
+
+import asyncio
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+import metrics_library as m
+
+# A callback running longer than STALL_THRESHOLD seconds is a stall, the loop is checked every STALL_INTERVAL.
+STALL_THRESHOLD = 0.25
+STALL_INTERVAL = 0.05
+
+# Seconds between stack samples of a sampling profile, and how long a profile runs before it stops itself.
+SAMPLE_INTERVAL = 0.005
+PROFILE_MAX_SECONDS = 600.0
+
+# Lines in a profile summary.
+PROFILE_TOP = 40
+
+def _stack(thread_id: int) -> list:
+    frame = sys._current_frames().get(thread_id)
+    return traceback.format_stack(frame) if frame != None else []
+
+class StallDetector:
+    """
+    Purpose:
+        Watches the event loop from a thread. The loop bumps a heartbeat every interval, and when
+        the heartbeat is late by more than threshold the thread samples the loop thread's stack,
+        which is the call blocking it.
+    Pre-Conditions:
+        :param report: Called from the watchdog thread with a message for each stall, must be thread safe.
+        :param threshold: Seconds a callback may block the loop before it's reported.
+        :param interval: Seconds between heartbeats.
+    """
+    def __init__(self, report, threshold: float = STALL_THRESHOLD, interval: float = STALL_INTERVAL) -> None:
+        self.report = report
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._loop = None
+        self._loop_thread = None
+        self._handle = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Starts watching the running event loop, call from it."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._heartbeat()
+        self._thread = threading.Thread(target=self._watch, name="stall-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._handle != None:
+            self._handle.cancel()
+
+    def _heartbeat(self) -> None:
+        self._beat = time.monotonic()
+        self._handle = self._loop.call_later(self.interval, self._heartbeat)
+
+    def _watch(self) -> None:
+        stalled = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            late = time.monotonic() - beat - self.interval
+            if stalled == None and late > self.threshold:
+                # Sampled while the loop is still stuck, so the stack shows the blocking call.
+                stalled = beat
+                self.stalls += 1
+                m.LOOP_STALLS.inc()
+                self.report(f"Event loop blocked for over {late:.2f}s in:\n" + "".join(_stack(self._loop_thread)[-12:]).rstrip())
+            elif stalled != None and beat != stalled:
+                self.report(f"Event loop unblocked after {beat - stalled - self.interval:.2f}s")
+                stalled = None
+
+class SamplingProfiler:
+    """
+    Purpose:
+        Samples the event loop thread's stack every interval from another thread, cheap enough
+        to leave on under live traffic. Time the loop spends waiting on its selector counts as idle.
+    Pre-Conditions:
+        :param thread_id: The event loop thread's ident.
+        :param interval: Seconds between samples.
+    """
+    kind = "sample"
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.idle = 0
+        # Samples each function was running in, and at the top of.
+        self.inclusive = Counter()
+        self.own = Counter()
+        self.started = None
+        self.stopped = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.monotonic()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame == None:
+                continue
+            self.samples += 1
+            code = frame.f_code
+            if code.co_name in ("select", "poll", "control") and "selectors" in code.co_filename:
+                self.idle += 1
+                continue
+            self.own[(code.co_filename, frame.f_lineno, code.co_name)] += 1
+            seen = set()
+            while frame != None:
+                key = (frame.f_code.co_filename, frame.f_code.co_firstlineno, frame.f_code.co_name)
+                if key not in seen:
+                    seen.add(key)
+                    self.inclusive[key] += 1
+                frame = frame.f_back
+
+    def summary(self, top: int = PROFILE_TOP) -> str:
+        elapsed = (self.stopped or time.monotonic()) - self.started
+        busy = self.samples - self.idle
+        lines = [f"Sampling profile, {elapsed:.1f}s, {self.samples} samples, loop busy {busy / max(1, self.samples) * 100:.1f}% of them", ""]
+        lines.append("Where the loop was when sampled (file:line function):")
+        for ((filename, lineno, name), count) in self.own.most_common(top):
+            lines.append(f"{count / max(1, busy) * 100:6.1f}%  {filename}:{lineno} {name}")
+        lines += ["", "Functions on the stack when sampled (file:first line function):"]
+        for ((filename, lineno, name), count) in self.inclusive.most_common(top):
+            lines.append(f"{count / max(1, busy) * 100:6.1f}%  {filename}:{lineno} {name}")
+        return "\n".join(lines) + "\n"
+
+class CProfiler:
+    # cProfile over the event loop thread, exact call counts but slows everything it profiles down.
+    kind = "cprofile"
+
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+        self.started = None
+        self.stopped = None
+
+    def start(self) -> None:
+        self.started = time.monotonic()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+        self.stopped = time.monotonic()
+
+    def summary(self, top: int = PROFILE_TOP) -> str:
+        text = io.StringIO()
+        text.write(f"cProfile, {(self.stopped or time.monotonic()) - self.started:.1f}s\n\n")
+        stats = pstats.Stats(self.profile, stream=text)
+        stats.sort_stats("tottime").print_stats(top)
+        stats.sort_stats("cumulative").print_stats(top)
+        return text.getvalue()
@@ -0,0 +1,172 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Shard Coordinator Library
+# Purpose: Run the bot as several processes, each owning a subset of gateway shards.
+# Date: 18OCTOBER2026
+#--------------------------------------------------------------------
+
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import bot_library as b
+
+# Seconds between the load reports each shard process sends to the coordinator.
+SHARD_REPORT = 60
+
+# Seconds to wait per shard before starting the next process, Discord allows one identify every 5 seconds.
+IDENTIFY_DELAY = 5
+
+# Bounds for the delay before a crashed shard process is restarted, doubling on every crash in a row.
+RESTART_MIN = 5
+RESTART_MAX = 300
+
+def shard_of(guild_id: int, shard_count: int) -> int:
+    # The shard Discord routes a guild to.
+    return (guild_id >> 22) % shard_count
+
+def partition(shard_count: int, processes: int) -> list:
+    """Splits shards 0..shard_count-1 across processes, round robin."""
+    processes = max(1, min(processes, shard_count))
+    return [list(range(i, shard_count, processes)) for i in range(processes)]
+
+def serve_shard(run, process: int, shard_ids: list, shard_count: int, reports) -> None:
+    # Runs in the shard process, SIGTERM from the coordinator closes the bot like Ctrl+C would.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    run(process, shard_ids, shard_count, reports)
+
+class Coordinator:
+    """
+    Purpose:
+        Starts one process per shard partition, restarts any that die, and collects the
+        load report each one sends, logging per-shard load and writing it to shards.json.
+    Pre-Conditions:
+        :param run: Module-level function(process, shard_ids, shard_count, reports) running one shard process.
+        :param shard_count: Total number of gateway shards.
+        :param processes: Number of processes to split the shards across.
+        :param path: Filepath of the bot's data folder.
+        :param name: The name of the bot, used for the log.
+        :param report_interval: Seconds between load summaries.
+    """
+    def __init__(self, run, shard_count: int, processes: int, path: str, name: str, report_interval: float = SHARD_REPORT) -> None:
+        self.run_shard = run
+        self.shard_count = shard_count
+        self.partitions = partition(shard_count, processes)
+        self.path = path
+        self.name = name
+        self.report_interval = report_interval
+
+        # Spawned rather than forked, so no process inherits another's threads or sockets.
+        self.context = multiprocessing.get_context("spawn")
+        self.reports = self.context.Queue()
+        self.processes = {}
+        self.restarts = {}
+        self.latest = {}
+
+    def log(self, string: str) -> None:
+        b.bot_logger(self.path, self.name, string)
+
+    def spawn(self, index: int) -> None:
+        process = self.context.Process(
+            target=serve_shard,
+            args=(self.run_shard, index, self.partitions[index], self.shard_count, self.reports),
+            name=f"{self.name}-{index}",
+        )
+        process.start()
+        self.processes[index] = process
+        self.log(f"Started process {index} (pid {process.pid}) for shards {self.partitions[index]}")
+
+    def start(self) -> None:
+        for index in range(len(self.partitions)):
+            self.spawn(index)
+            if index < len(self.partitions) - 1:
+                time.sleep(IDENTIFY_DELAY * len(self.partitions[index]))
+
+    def check(self) -> None:
+        # Restarts dead processes, backing off when one keeps crashing.
+        now = time.monotonic()
+        for (index, process) in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            (delay, due) = self.restarts.get(index, (0, None))
+            if due == None:
+                delay = min(max(RESTART_MIN, delay * 2), RESTART_MAX)
+                self.restarts[index] = (delay, now + delay)
+                self.latest.pop(index, None)
+                self.log(f"Process {index} exited with code {process.exitcode}, restarting in {delay}s")
+            elif now >= due:
+                self.restarts[index] = (delay, None)
+                self.spawn(index)
+
+    def receive(self, timeout: float) -> None:
+        try:
+            report = self.reports.get(timeout=timeout)
+        except queue.Empty:
+            return
+        self.latest[report["process"]] = report
+        # A process that reports is healthy again, so its next crash starts the back-off over.
+        if self.restarts.get(report["process"], (0, None))[1] == None:
+            self.restarts.pop(report["process"], None)
+
+    def summary(self) -> dict:
+        """Returns the latest load of every shard, and of every process."""
+        now = time.time()
+        shards = {}
+        processes = {}
+        for (index, shard_ids) in enumerate(self.partitions):
+            report = self.latest.get(index)
+            processes[index] = {
+                "pid": self.processes[index].pid if index in self.processes else None,
+                "alive": index in self.processes and self.processes[index].is_alive(),
+                "age": round(now - report["time"], 1) if report != None else None,
+                "refreshing": report["refreshing"] if report != None else None,
+                "cache": report["cache"] if report != None else None,
+            }
+            for shard_id in shard_ids:
+                load = report["shards"].get(shard_id) if report != None else None
+                shards[shard_id] = dict(process=index, **(load or {}))
+        return {"time": now, "shard_count": self.shard_count, "shards": shards, "processes": processes}
+
+    def report(self) -> None:
+        summary = self.summary()
+        for (shard_id, load) in summary["shards"].items():
+            if "guilds" in load:
+                self.log(f"Shard {shard_id} (process {load['process']}): {load['guilds']} guilds, {load['tracked']} tracked, {load['latency'] * 1000:.0f}ms latency")
+            else:
+                self.log(f"Shard {shard_id} (process {load['process']}): no report")
+
+        filename = self.path + "shards.json"
+        with open(filename + ".tmp", "w") as json_file:
+            json.dump(summary, json_file, indent=4)
+            json_file.close()
+        os.replace(filename + ".tmp", filename)
+
+    def run(self) -> None:
+        """Starts the shard processes and coordinates them until interrupted."""
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            self.start()
+            next_report = time.monotonic() + self.report_interval
+            while True:
+                self.receive(timeout=1)
+                self.check()
+                if time.monotonic() >= next_report:
+                    self.report()
+                    next_report = time.monotonic() + self.report_interval
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 30) -> None:
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        self.log("Stopped all shard processes")
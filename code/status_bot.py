@@ -8,47 +8,245 @@
 #   - Overhauled the entire codebase (again)
 #   - Converted all bot functions to use Cogs
 #   - Switched from using an external API to using https://github.com/py-mine/mcstatus
+# Updated: 18OCTOBER2026
+#   - Added a sharded mode, running several processes under a coordinator.
+#   - Restarts warm from the snapshots and DNS answers the last run saved.
 #--------------------------------------------------------------------
 
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
 import discord
+import functools
 import os
+import time
 
 import bot_library as b
+import dispatch_library as d
+import history_library as h
+import metrics_library as m
+import shard_library as sh
+import status_library as s
+import tracker_library as t
 
-class StatusBot(commands.Bot):
-    def __init__(self) -> None:
+class StatusBot(commands.AutoShardedBot):
+    def __init__(self, process: int = 0, shard_ids: list | None = None, shard_count: int = 1, reports=None) -> None:
         intents = discord.Intents.default()
         intents.message_content = True
         self.path = "/status_bot/"
-        self.name = "status_bot"
+
+        # In sharded mode each process owns shard_ids, keeps its own log and sends load reports to the coordinator.
+        self.process = process
+        self.reports = reports
+        self.name = "status_bot" if shard_ids == None else f"status_bot-{process}"
+        self.started = time.perf_counter()
+
+        # State cogs hand to their replacements across a hot reload, keyed by cog name.
+        self.handoff = {}
+
+        # Batched, rotating log writer, every bot_logger() call for this bot goes through it.
+        self.logger = b.get_logger(
+            self.path, self.name,
+            max_bytes=int(os.getenv("LOG_MAX_BYTES", b.LOG_MAX_BYTES)),
+            backups=int(os.getenv("LOG_BACKUPS", b.LOG_BACKUPS)),
+        )
+
+        # Cached SRV and A lookups for every probe.
+        self.resolver = s.Resolver(
+            min_ttl=float(os.getenv("DNS_MIN_TTL", s.DNS_MIN_TTL)),
+            max_ttl=float(os.getenv("DNS_MAX_TTL", s.DNS_MAX_TTL)),
+        )
+
+        # Which protocols each server speaks, kept across restarts.
+        self.protocol_profiles = s.ProtocolProfiles(self.path + ("protocols.json" if shard_ids == None else f"protocols-{process}.json"))
+
+        # Player count, latency and uptime history of tracked servers, kept across restarts.
+        self.history = h.History(
+            self.path + ("history.json" if shard_ids == None else f"history-{process}.json"),
+            maxsize=int(os.getenv("HISTORY_SIZE", h.HISTORY_SIZE)),
+        )
+
+        # Status cache shared by the StatusBot and StatusTracker cogs.
+        self.status_cache = s.StatusCache(
+            ttl=float(os.getenv("STATUS_CACHE_TTL", s.CACHE_TTL)),
+            maxsize=int(os.getenv("STATUS_CACHE_SIZE", s.CACHE_SIZE)),
+            probe=functools.partial(s.probe_server, resolver=self.resolver),
+            profiles=self.protocol_profiles,
+            warm_concurrency=int(os.getenv("WARM_CONCURRENCY", s.WARM_CONCURRENCY)),
+        )
+
+        # The latest snapshots, DNS answers and edit fingerprints, saved so a restart starts warm.
+        self.warm_state = s.WarmState(
+            self.path + ("warm.json.gz" if shard_ids == None else f"warm-{process}.json.gz"),
+            max_age=float(os.getenv("WARM_MAX_AGE", s.WARM_MAX_AGE)),
+        )
+        self.warm = None
+
+        # Decoded server icons, the default icon is read from disk only once here.
+        self.icon_cache = s.IconCache(
+            self.path + "server-icons/default-64.png",
+            max_bytes=int(os.getenv("ICON_CACHE_BYTES", s.ICON_CACHE_BYTES)),
+        )
+
+        # Every tracked message edit goes through here, rate limited per channel.
+        self.dispatcher = d.EditDispatcher(
+            rate=float(os.getenv("DISPATCH_RATE", d.DISPATCH_RATE)),
+            burst=int(os.getenv("DISPATCH_BURST", d.DISPATCH_BURST)),
+            concurrency=int(os.getenv("DISPATCH_CONCURRENCY", d.DISPATCH_CONCURRENCY)),
+        )
+
+        # Metrics cost next to nothing until turned on, with METRICS=1 or a METRICS_PORT to serve them on.
+        m.REGISTRY.enabled = os.getenv("METRICS", "0").lower() in ("1", "true", "yes") or int(os.getenv("METRICS_PORT", 0)) > 0
+        m.REGISTRY.callback("status_cache_entries", "Server statuses in the status cache.", "gauge", lambda: len(self.status_cache))
+        m.REGISTRY.callback("status_cache_hits_total", "Status cache hits.", "counter", lambda: self.status_cache.hits)
+        m.REGISTRY.callback("status_cache_misses_total", "Status cache misses.", "counter", lambda: self.status_cache.misses)
+        m.REGISTRY.callback("status_cache_coalesced_total", "Status requests that joined a probe already in flight.", "counter", lambda: self.status_cache.coalesced)
+        m.REGISTRY.callback("status_cache_stale_total", "Results restored from the last run served while being reprobed.", "counter", lambda: self.status_cache.stale)
+        m.REGISTRY.callback("status_cache_backed_off_total", "Background refreshes skipped while an address was backed off.", "counter", lambda: self.status_cache.backed_off)
+        m.REGISTRY.callback("status_dns_hits_total", "DNS cache hits.", "counter", lambda: self.resolver.hits)
+        m.REGISTRY.callback("status_dns_misses_total", "DNS cache misses.", "counter", lambda: self.resolver.misses)
+        m.REGISTRY.callback("status_dispatch_queue", "Message edits waiting to be sent.", "gauge", lambda: self.dispatcher.depth())
+        m.REGISTRY.callback("status_dispatch_coalesced_total", "Message edits replaced by a newer one before they were sent.", "counter", lambda: self.dispatcher.coalesced)
+        m.REGISTRY.callback("status_icon_cache_bytes", "Bytes of decoded server icons cached.", "gauge", lambda: self.icon_cache.size)
 
         super().__init__(
             command_prefix=commands.when_mentioned_or("!"),
             intents=intents,
             help_command=None,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
         )
 
-    # Function to load in all the cogs.
+    # Function to load in all the cogs, once, before the bot connects.
     async def load_extensions(self) -> None:
-        for folder in os.listdir("modules"):
+        start = time.perf_counter()
+        for folder in sorted(os.listdir("modules")):
             if os.path.exists(os.path.join("modules", folder, "cog.py")):
-                b.bot_logger(self.path, self.name, f"Cog {folder} has been loaded")
-                await self.load_extension(f"modules.{folder}.cog")
+                loaded = time.perf_counter()
+                try:
+                    await self.load_extension(f"modules.{folder}.cog")
+                except commands.ExtensionError as err:
+                    b.bot_logger(self.path, self.name, f"Cog {folder} failed to load: {err}")
+                    continue
+                b.bot_logger(self.path, self.name, f"Cog {folder} has been loaded in {time.perf_counter() - loaded:.3f}s")
+        b.bot_logger(self.path, self.name, f"Cogs loaded in {time.perf_counter() - start:.3f}s")
 
     # Logging function to decrease clutter.
     def log(self, channel, author, content) -> None:
-        b.bot_logger(self.path, self.name, f'[{channel}] [{author}] {content}')
+        self.logger.log(f'[{channel}] [{author}] {content}')
+
+    # Loads the cogs and starts the background jobs before the bot connects.
+    async def setup_hook(self) -> None:
+        await self.load_extensions()
+        # Read in the background, the tracker waits for it before its first refresh.
+        self.warm = asyncio.ensure_future(self.load_warm())
+        self.save_state.start()
+        if self.reports != None:
+            self.report_load.change_interval(seconds=float(os.getenv("SHARD_REPORT", sh.SHARD_REPORT)))
+            self.report_load.start()
+
+    # Restores the state saved by the last run.
+    async def load_warm(self) -> None:
+        # The tracker waits on this before its first refresh, so a bad file must not raise.
+        try:
+            data = await asyncio.to_thread(self.warm_state.read)
+            if data == None:
+                return
+            (snapshots, answers) = self.warm_state.restore(data, self.status_cache, self.resolver)
+            fingerprints = data.get("fingerprints", {})
+            tracker = self.get_cog("StatusTracker")
+            if tracker != None:
+                tracker.restore_fingerprints(fingerprints)
+        except Exception as err:
+            b.bot_logger(self.path, self.name, f"Failed to restore the warm state, starting cold: {err}")
+            return
+        b.bot_logger(self.path, self.name, f"Restored {snapshots} server snapshots, {answers} DNS answers and {len(fingerprints)} tracked embeds saved {time.time() - data.get('time', 0):.0f}s ago")
+
+    def dump_warm(self) -> dict:
+        tracker = self.get_cog("StatusTracker")
+        return self.warm_state.dumps(self.status_cache, self.resolver, tracker.export_fingerprints() if tracker != None else {})
+
+    # Periodically saves the learned protocol profiles, the server history and the warm restart state.
+    @tasks.loop(minutes=5)
+    async def save_state(self) -> None:
+        if self.protocol_profiles.dirty:
+            await asyncio.to_thread(self.protocol_profiles.write, self.protocol_profiles.dumps())
+        if self.history.dirty:
+            # Only copying it blocks the loop, the history is tens of MB once serialized.
+            await asyncio.to_thread(self.history.save, self.history.snapshot())
+        # Not until the saved state is read back, or a quick restart would overwrite it with less.
+        if self.warm != None and self.warm.done():
+            await asyncio.to_thread(self.warm_state.write, self.dump_warm())
+
+    # The load of this process and each of its shards, for the coordinator.
+    def load(self) -> dict:
+        shards = {shard_id: {"guilds": 0, "tracked": 0, "latency": latency} for (shard_id, latency) in self.latencies}
+        for guild in self.guilds:
+            if guild.shard_id in shards:
+                shards[guild.shard_id]["guilds"] += 1
+
+        tracker = self.get_cog("StatusTracker")
+        if tracker != None:
+            for row in tracker.schedule:
+                if row.guild_id != None and sh.shard_of(row.guild_id, self.shard_count) in shards:
+                    shards[sh.shard_of(row.guild_id, self.shard_count)]["tracked"] += 1
+
+        return {
+            "process": self.process,
+            "time": time.time(),
+            "shards": shards,
+            "refreshing": len(tracker.refreshing) if tracker != None else 0,
+            "cache": {"entries": len(self.status_cache), "hits": self.status_cache.hits, "misses": self.status_cache.misses},
+            "edits": {"queued": self.dispatcher.depth(), "interactive": self.dispatcher.depth(True), "coalesced": self.dispatcher.coalesced},
+        }
+
+    # Sends this process's load to the coordinator.
+    @tasks.loop(seconds=sh.SHARD_REPORT)
+    async def report_load(self) -> None:
+        try:
+            self.reports.put_nowait(self.load())
+        except Exception as err:
+            b.bot_logger(self.path, self.name, f"Failed to send load report: {err}")
 
     # Function for On Ready behavior.
     async def on_ready(self) -> None:
         await self.wait_until_ready()
-        b.bot_logger(self.path, self.name, f"We have logged in as {self.user}")
+        b.bot_logger(self.path, self.name, f"We have logged in as {self.user}, {time.perf_counter() - self.started:.2f}s after starting")
         self.owner_id = (await self.application_info()).owner.id
-        await self.load_extensions()
 
+    # Save state and flush the log on shutdown.
+    async def close(self) -> None:
+        self.save_state.cancel()
+        self.report_load.cancel()
+        self.dispatcher.close()
+        # Collected before the cogs are unloaded with the tracker's fingerprints.
+        warm = self.dump_warm() if self.warm != None and self.warm.done() else None
+        await super().close()
+        self.protocol_profiles.save()
+        self.history.save()
+        if warm != None:
+            self.warm_state.write(warm)
+        self.logger.close()
 
 
-if __name__ == "__main__":
-    bot = StatusBot()
+# Runs one shard process, started by the coordinator.
+def run_shard(process: int, shard_ids: list, shard_count: int, reports) -> None:
+    bot = StatusBot(process=process, shard_ids=shard_ids, shard_count=shard_count, reports=reports)
     bot.run(os.getenv("BOT_ID"))
+
+
+if __name__ == "__main__":
+    shard_count = int(os.getenv("SHARD_COUNT", 0))
+    if shard_count > 0:
+        # Import messages.json once here, so shard processes don't race each other for it.
+        store = t.TrackerStore("/status_bot/tracker.db")
+        store.migrate_json("/status_bot/messages.json")
+        store.close()
+
+        coordinator = sh.Coordinator(
+            run_shard, shard_count, int(os.getenv("SHARD_PROCESSES", 1)), "/status_bot/", "status_bot",
+            report_interval=float(os.getenv("SHARD_REPORT", sh.SHARD_REPORT)),
+        )
+        coordinator.run()
+    else:
+        bot = StatusBot()
+        bot.run(os.getenv("BOT_ID"))
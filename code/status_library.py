@@ -0,0 +1,938 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Minecraft Status Library
+# Purpose: Shared Minecraft server probing logic for the status_bot cogs.
+# Date: 18OCTOBER2026
+#--------------------------------------------------------------------
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import socket
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from mcstatus import JavaServer, BedrockServer
+from mcstatus.address import Address
+from mcstatus.protocol.connection import TCPAsyncSocketConnection, UDPAsyncSocketConnection
+from mcstatus.querier import AsyncServerQuerier
+from mcstatus.utils import retry
+
+import metrics_library as m
+
+# Protocol names, also used as the ProbeResult attribute names.
+JAVA_STATUS = "java_status"
+JAVA_QUERY = "java_query"
+BEDROCK_STATUS = "bedrock_status"
+PROTOCOLS = (JAVA_STATUS, JAVA_QUERY, BEDROCK_STATUS)
+
+# Socket timeout for each individual probe, and the overall probe deadline.
+PROBE_TIMEOUT = 0.5
+PROBE_DEADLINE = 3.0
+
+# DNS answers are cached for their record TTL, clamped to these bounds, failures for DNS_NEGATIVE_TTL.
+DNS_MIN_TTL = 60.0
+DNS_MAX_TTL = 3600.0
+DNS_NEGATIVE_TTL = 15.0
+DNS_CACHE_SIZE = 4096
+
+# Adaptive probe timeouts, derived from each address's latency history.
+TIMEOUT_MIN = 0.5
+TIMEOUT_MAX = 2.5
+TIMEOUT_INITIAL = 1.0
+
+# Addresses failing FAILURE_THRESHOLD probes in a row are backed off, doubling from BACKOFF_BASE up to BACKOFF_MAX seconds.
+FAILURE_THRESHOLD = 2
+BACKOFF_BASE = 60.0
+BACKOFF_MAX = 3600.0
+HEALTH_SIZE = 8192
+
+# A protocol that fails PROFILE_SKIP_AFTER probes in a row, while another protocol answers,
+# is skipped and only re-checked every PROFILE_RECHECK seconds.
+PROFILE_SKIP_AFTER = 3
+PROFILE_RECHECK = 3600.0
+PROFILE_SIZE = 8192
+
+# Defaults for the shared status cache.
+CACHE_TTL = 30.0
+CACHE_SIZE = 1024
+
+# Saved snapshots older than WARM_MAX_AGE seconds aren't served after a restart, and at most
+# WARM_CONCURRENCY restored addresses are reprobed at once.
+WARM_MAX_AGE = 3600.0
+WARM_CONCURRENCY = 16
+
+# Byte budget of the decoded favicon cache.
+ICON_CACHE_BYTES = 8 * 1024 * 1024
+
+class ProbeResult:
+    """
+    Purpose:
+        Holds the outcome of a single probe_server() call.
+    Attributes:
+        address: The address that was probed.
+        java_status: The mcstatus PingResponse, or None.
+        java_query: The mcstatus QueryResponse, or None.
+        bedrock_status: The mcstatus BedrockStatusResponse, or None.
+        timings: Seconds each protocol took to answer or fail, keyed by protocol.
+        errors: The exception each failed protocol raised, keyed by protocol.
+        probed: The time the probe started, every copy of a cached result shares it.
+    """
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self.probed = time.time()
+        self.java_status = None
+        self.java_query = None
+        self.bedrock_status = None
+        self.timings = {}
+        self.errors = {}
+        # The time a result restored from disk was saved, None for a live probe.
+        self.restored = None
+        self._snapshot = None
+
+    @classmethod
+    def restore(cls, snapshot: "ServerSnapshot", saved: float) -> "ProbeResult":
+        """A result holding only a snapshot saved by an earlier run, it has no raw responses."""
+        result = cls(snapshot.address)
+        result.restored = saved
+        result.probed = saved
+        result._snapshot = snapshot
+        return result
+
+    @property
+    def answered(self) -> list:
+        """The protocols that answered, in PROTOCOLS order."""
+        return [protocol for protocol in PROTOCOLS if getattr(self, protocol) != None]
+
+    @property
+    def online(self) -> bool:
+        return self.answered != []
+
+    def unpack(self) -> tuple:
+        """Returns the legacy ((java_status, java_query), bedrock_status) tuple."""
+        return ((self.java_status, self.java_query), self.bedrock_status)
+
+    def snapshot(self) -> "ServerSnapshot":
+        """The normalized ServerSnapshot of this result, built on first use and kept with it."""
+        if self._snapshot == None:
+            self._snapshot = ServerSnapshot.from_result(self)
+        return self._snapshot
+
+def strip_formatting(text: str | None) -> str | None:
+    # Removes Minecraft's § colour and style codes.
+    return re.sub("[§][a-z0-9]", "", text) if text != None else None
+
+class ServerSnapshot:
+    """
+    Purpose:
+        Everything the commands and the tracker show about a server, normalized across
+        Java status, Java query and Bedrock status. Query answers win over status answers,
+        and Java over Bedrock, the same order the embeds have always used.
+    Attributes:
+        edition: "java", "bedrock", or None if the server didn't answer.
+        source: The protocol the motd, players and version came from, or None.
+        latency: Round trip in milliseconds, or None.
+        favicon: The raw "data:image/png;base64," favicon, or None.
+        mods: (modid, version) tuples from a Forge mod list.
+    """
+    __slots__ = (
+        "address", "online", "edition", "source", "motd", "players_online", "players_max", "player_names",
+        "version", "brand", "plugins", "mods", "map", "gamemode", "latency", "favicon", "protocol",
+    )
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self.online = False
+        self.edition = None
+        self.source = None
+        self.motd = None
+        self.players_online = None
+        self.players_max = None
+        self.player_names = []
+        self.version = None
+        self.brand = None
+        self.plugins = []
+        self.mods = []
+        self.map = None
+        self.gamemode = None
+        self.latency = None
+        self.favicon = None
+        self.protocol = None
+
+    @classmethod
+    def from_result(cls, result: ProbeResult) -> "ServerSnapshot":
+        snapshot = cls(result.address)
+        ((java_status, java_query), bedrock_status) = result.unpack()
+
+        if java_status != None:
+            snapshot.edition = "java"
+            snapshot.source = JAVA_STATUS
+            snapshot.motd = strip_formatting(java_status.description)
+            snapshot.players_online = java_status.players.online
+            snapshot.players_max = java_status.players.max
+            snapshot.player_names = [player.name for player in java_status.players.sample or []]
+            snapshot.version = java_status.version.name
+            snapshot.protocol = java_status.version.protocol
+            snapshot.latency = java_status.latency
+            snapshot.favicon = java_status.favicon if "favicon" in java_status.raw.keys() else None
+            modinfo = java_status.raw.get("modinfo")
+            if isinstance(modinfo, dict):
+                snapshot.mods = [(mod["modid"], mod["version"]) for mod in modinfo.get("modList", [])]
+
+        if java_query != None:
+            snapshot.edition = "java"
+            snapshot.source = JAVA_QUERY
+            snapshot.motd = strip_formatting(java_query.motd)
+            snapshot.players_online = java_query.players.online
+            snapshot.players_max = java_query.players.max
+            snapshot.player_names = list(java_query.players.names)
+            snapshot.brand = java_query.software.brand
+            snapshot.version = java_query.software.version
+            snapshot.plugins = list(java_query.software.plugins)
+            snapshot.map = java_query.map
+
+        if snapshot.edition == None and bedrock_status != None:
+            snapshot.edition = "bedrock"
+            snapshot.source = BEDROCK_STATUS
+            snapshot.motd = strip_formatting(bedrock_status.motd)
+            snapshot.map = strip_formatting(bedrock_status.map)
+            snapshot.players_online = bedrock_status.players_online
+            snapshot.players_max = bedrock_status.players_max
+            snapshot.brand = bedrock_status.version.brand
+            snapshot.version = bedrock_status.version.version
+            snapshot.protocol = bedrock_status.version.protocol
+            snapshot.gamemode = bedrock_status.gamemode
+            # mcstatus reports Bedrock latency in seconds, Java in milliseconds.
+            snapshot.latency = bedrock_status.latency * 1000
+
+        snapshot.online = snapshot.edition != None
+        return snapshot
+
+    def dumps(self) -> list:
+        """The snapshot as a JSON-friendly list, in __slots__ order."""
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def loads(cls, values: list) -> "ServerSnapshot":
+        snapshot = cls(values[0])
+        for (name, value) in zip(cls.__slots__, values):
+            setattr(snapshot, name, value)
+        snapshot.mods = [tuple(mod) for mod in snapshot.mods]
+        return snapshot
+
+class ResolvedJavaServer(JavaServer):
+    """
+    Purpose:
+        A JavaServer that connects to an already resolved IP, while still sending the
+        hostname in the handshake so virtual hosts keep working.
+    Pre-Conditions:
+        :param ip: The resolved IP of host.
+    """
+    def __init__(self, host: str, port: int, ip: str, timeout: float = 3) -> None:
+        super().__init__(host, port, timeout=timeout)
+        self.ip = ip
+        # Address caches its IP for async_query(), so the query skips its own A lookup.
+        self.address._cached_ip = ipaddress.ip_address(ip)
+
+    # Both close their connection, mcstatus leaves that to __del__, which can run after the event loop has closed.
+    async def async_status(self, **kwargs):
+        connection = TCPAsyncSocketConnection()
+        try:
+            await connection.connect(Address(self.ip, self.address.port), self.timeout)
+            return await self._retry_async_status(connection, **kwargs)
+        finally:
+            connection.close()
+
+    @retry(tries=3)
+    async def _retry_async_query(self, address: Address):
+        connection = UDPAsyncSocketConnection()
+        try:
+            await connection.connect(address, self.timeout)
+            querier = AsyncServerQuerier(connection)
+            await querier.handshake()
+            return await querier.read_query()
+        finally:
+            connection.close()
+
+class Resolver:
+    """
+    Purpose:
+        Caches the SRV and A lookups behind JavaServer.async_lookup() and BedrockServer.lookup().
+        Answers are kept for their record TTL clamped to [min_ttl, max_ttl], failures for negative_ttl.
+    Pre-Conditions:
+        :param min_ttl: The shortest time an answer is cached.
+        :param max_ttl: The longest time an answer is cached.
+        :param negative_ttl: How long a failed lookup is cached.
+        :param maxsize: The most names cached, least recently used are evicted first.
+    """
+    def __init__(self, min_ttl: float = DNS_MIN_TTL, max_ttl: float = DNS_MAX_TTL, negative_ttl: float = DNS_NEGATIVE_TTL, maxsize: int = DNS_CACHE_SIZE) -> None:
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry == None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _put(self, key: tuple, value, ttl: float, error: Exception | None = None) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value, error)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def export(self) -> list:
+        """Returns [kind, host, seconds left, answer] for every cached answer that isn't a failure."""
+        now = time.monotonic()
+        return [[key[0], key[1], entry[0] - now, entry[1]] for (key, entry) in self._entries.items() if entry[2] == None and entry[0] > now]
+
+    def restore(self, answers: list, age: float) -> int:
+        """Caches answers from export() that are still valid age seconds later, returns how many."""
+        count = 0
+        for (kind, host, left, value) in answers:
+            if left - age > 0 and (kind, host) not in self._entries:
+                # JSON turns SRV (target, port) answers into lists.
+                self._put((kind, host), tuple(value) if isinstance(value, list) else value, left - age)
+                count += 1
+        return count
+
+    def _ttl(self, answers) -> float:
+        return min(max(answers.rrset.ttl, self.min_ttl), self.max_ttl)
+
+    async def srv(self, host: str, lifetime: float | None = None) -> tuple | None:
+        """Returns the (target, port) of host's _minecraft._tcp SRV record, or None if it has none."""
+        key = ("SRV", host.lower())
+        entry = self._get(key)
+        if entry != None:
+            if entry[2] != None:
+                raise entry[2]
+            return entry[1]
+
+        try:
+            answers = await dns.asyncresolver.resolve("_minecraft._tcp." + host, "SRV", lifetime=lifetime)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            # Most servers have no SRV record, that's a real answer, so it's cached like one.
+            # Failing nameservers aren't, they'd send SRV hosted servers to the default port.
+            self._put(key, None, self.min_ttl)
+            return None
+        except dns.exception.DNSException as err:
+            self._put(key, None, self.negative_ttl, err)
+            raise
+
+        answer = answers[0]
+        target = (str(answer.target).rstrip("."), int(answer.port))
+        self._put(key, target, self._ttl(answers))
+        return target
+
+    async def ip(self, host: str, lifetime: float | None = None) -> str:
+        """Returns an IP for host, from its A record or the system resolver if it has none."""
+        try:
+            return str(ipaddress.ip_address(host))
+        except ValueError:
+            pass
+
+        key = ("A", host.lower())
+        entry = self._get(key)
+        if entry != None:
+            if entry[2] != None:
+                raise entry[2]
+            return entry[1]
+
+        try:
+            answers = await dns.asyncresolver.resolve(host, "A", lifetime=lifetime)
+            ip = str(answers[0]).rstrip(".")
+            self._put(key, ip, self._ttl(answers))
+            return ip
+        except dns.exception.DNSException:
+            pass
+
+        # Fall back on the system resolver for hosts files and IPv6-only servers.
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except OSError as err:
+            self._put(key, None, self.negative_ttl, err)
+            raise
+        ip = infos[0][4][0]
+        self._put(key, ip, self.min_ttl)
+        return ip
+
+    async def java(self, address: str, timeout: float = PROBE_TIMEOUT) -> ResolvedJavaServer:
+        """The cached equivalent of JavaServer.async_lookup()."""
+        (host, port) = _parse_address(address)
+        if port == None:
+            target = await self.srv(host, lifetime=timeout)
+            (host, port) = target if target != None else (host, JavaServer.DEFAULT_PORT)
+        return ResolvedJavaServer(host, port, await self.ip(host, lifetime=timeout), timeout=timeout)
+
+    async def bedrock(self, address: str, timeout: float = PROBE_TIMEOUT) -> BedrockServer:
+        """The cached and non-blocking equivalent of BedrockServer.lookup()."""
+        (host, port) = _parse_address(address)
+        return BedrockServer(await self.ip(host, lifetime=timeout), port if port != None else BedrockServer.DEFAULT_PORT, timeout=timeout)
+
+def _parse_address(address: str) -> tuple:
+    # Splits "host[:port]" the same way mcstatus does, port is None if it's missing.
+    parsed = urlparse("//" + address)
+    if not parsed.hostname:
+        raise ValueError(f"Invalid address '{address}', can't parse.")
+    return (parsed.hostname, parsed.port)
+
+async def _timed_probe(result: ProbeResult, protocol: str, coro) -> None:
+    # Runs one protocol probe, recording its response, error and duration.
+    start = time.perf_counter()
+    try:
+        setattr(result, protocol, await coro)
+    except Exception as err:
+        result.errors[protocol] = err
+    finally:
+        result.timings[protocol] = time.perf_counter() - start
+
+async def probe_server(address: str, timeout: float = PROBE_TIMEOUT, deadline: float | None = PROBE_DEADLINE, resolver: Resolver | None = None, protocols: tuple = PROTOCOLS) -> ProbeResult:
+    """
+    Purpose:
+        Probes an address over Java status, Java query and Bedrock status concurrently.
+    Pre-Conditions:
+        :param address: The server address, with an optional port.
+        :param timeout: The socket timeout passed to each mcstatus probe.
+        :param deadline: The overall time limit in seconds, or None for no limit.
+        :param resolver: The Resolver caching DNS lookups, or None to let mcstatus resolve every time.
+        :param protocols: The protocols to probe, the others are left as None.
+    Post-Conditions:
+        Probes still running at the deadline are cancelled and recorded as timeouts.
+    Return:
+        A ProbeResult for the address.
+    """
+    result = ProbeResult(address)
+
+    # The SRV lookup is shared by the Java status and query probes.
+    java = None
+    if JAVA_STATUS in protocols or JAVA_QUERY in protocols:
+        if resolver != None:
+            java = asyncio.ensure_future(resolver.java(address, timeout=timeout))
+        else:
+            java = asyncio.ensure_future(JavaServer.async_lookup(address, timeout=timeout))
+
+    async def java_status():
+        return await (await java).async_status()
+
+    async def java_query():
+        return await (await java).async_query()
+
+    async def bedrock_status():
+        if resolver != None:
+            return await (await resolver.bedrock(address, timeout=timeout)).async_status()
+        # BedrockServer.lookup() resolves the host synchronously, so it runs off the event loop.
+        return await (await asyncio.to_thread(BedrockServer.lookup, address, timeout=timeout)).async_status()
+
+    probes = {
+        JAVA_STATUS: java_status,
+        JAVA_QUERY: java_query,
+        BEDROCK_STATUS: bedrock_status,
+    }
+    tasks = {asyncio.ensure_future(_timed_probe(result, protocol, probes[protocol]())): protocol for protocol in protocols}
+    if tasks == {}:
+        return result
+
+    (_, pending) = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+        for task in pending:
+            result.errors[tasks[task]] = asyncio.TimeoutError()
+    if java == None:
+        pass
+    elif not java.done():
+        java.cancel()
+    elif not java.cancelled():
+        # Retrieve the exception so a failed lookup isn't reported as never retrieved.
+        java.exception()
+
+    if m.REGISTRY.enabled:
+        for protocol in tasks.values():
+            error = result.errors.get(protocol)
+            m.PROBES.inc(protocol, "ok" if error == None else "timeout" if isinstance(error, (asyncio.TimeoutError, TimeoutError)) else "error")
+            m.PROBE_SECONDS.observe(result.timings.get(protocol, 0.0), protocol)
+
+    return result
+
+class AddressHealth:
+    """
+    Purpose:
+        Tracks each address's probe latency and failures, to pick its probe timeout and
+        to back off from addresses that keep failing.
+        Timeouts follow TCP's retransmission timeout: a smoothed latency plus four times its
+        smoothed deviation, doubled after a failed probe, clamped to [min_timeout, max_timeout].
+    Pre-Conditions:
+        :param min_timeout: The shortest probe timeout.
+        :param max_timeout: The longest probe timeout.
+        :param initial_timeout: The probe timeout of an address with no history.
+        :param threshold: Consecutive failures before an address is backed off.
+        :param base_backoff: Seconds of the first back off, doubled on every further failure.
+        :param max_backoff: The longest back off.
+        :param maxsize: The most addresses tracked, least recently used are forgotten first.
+    """
+    def __init__(self, min_timeout: float = TIMEOUT_MIN, max_timeout: float = TIMEOUT_MAX, initial_timeout: float = TIMEOUT_INITIAL,
+                 threshold: int = FAILURE_THRESHOLD, base_backoff: float = BACKOFF_BASE, max_backoff: float = BACKOFF_MAX, maxsize: int = HEALTH_SIZE) -> None:
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.initial_timeout = initial_timeout
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.maxsize = maxsize
+        # [smoothed latency, latency deviation, timeout, consecutive failures, retry time, last failed result], keyed by address.
+        self._stats = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    def _entry(self, key: str) -> list:
+        stats = self._stats.get(key)
+        if stats == None:
+            stats = self._stats[key] = [None, None, self.initial_timeout, 0, 0.0, None]
+            while len(self._stats) > self.maxsize:
+                self._stats.popitem(last=False)
+        self._stats.move_to_end(key)
+        return stats
+
+    def timeout(self, key: str) -> float:
+        stats = self._stats.get(key)
+        return stats[2] if stats != None else self.initial_timeout
+
+    def failures(self, key: str) -> int:
+        stats = self._stats.get(key)
+        return stats[3] if stats != None else 0
+
+    def backing_off(self, key: str) -> bool:
+        stats = self._stats.get(key)
+        return stats != None and stats[4] > time.monotonic()
+
+    def last_failure(self, key: str) -> ProbeResult | None:
+        """The result of an address's last failed probe, while it's still failing."""
+        stats = self._stats.get(key)
+        return stats[5] if stats != None else None
+
+    def record(self, key: str, result: ProbeResult) -> None:
+        """Updates an address's history with the outcome of a probe."""
+        stats = self._entry(key)
+        latencies = [result.timings[protocol] for protocol in result.answered if protocol in result.timings]
+
+        if latencies == []:
+            # Kept here rather than relying on the status cache, which may have evicted it by the retry.
+            stats[5] = result
+            stats[3] += 1
+            stats[2] = min(stats[2] * 2, self.max_timeout)
+            if stats[3] >= self.threshold:
+                backoff = min(self.base_backoff * 2 ** (stats[3] - self.threshold), self.max_backoff)
+                stats[4] = time.monotonic() + backoff
+            return
+
+        # The slowest protocol that answered, so the timeout covers all of them.
+        sample = max(latencies)
+        if stats[0] == None:
+            stats[0] = sample
+            stats[1] = sample / 2
+        else:
+            stats[1] = 0.75 * stats[1] + 0.25 * abs(stats[0] - sample)
+            stats[0] = 0.875 * stats[0] + 0.125 * sample
+        stats[2] = min(max(stats[0] + 4 * stats[1], self.min_timeout), self.max_timeout)
+        stats[3] = 0
+        stats[4] = 0.0
+        stats[5] = None
+
+class ProtocolProfiles:
+    """
+    Purpose:
+        Learns which protocols each address actually speaks, so probes can skip the ones that never answer.
+    Pre-Conditions:
+        :param filename: JSON file the profiles are loaded from and saved to, or None to keep them in memory.
+        :param skip_after: Failures in a row before a protocol is skipped.
+        :param recheck: Seconds between re-checks of a skipped protocol.
+        :param maxsize: The most addresses kept, least recently used are forgotten first.
+    """
+    def __init__(self, filename: str | None = None, skip_after: int = PROFILE_SKIP_AFTER, recheck: float = PROFILE_RECHECK, maxsize: int = PROFILE_SIZE) -> None:
+        self.filename = filename
+        self.skip_after = skip_after
+        self.recheck = recheck
+        self.maxsize = maxsize
+        # {protocol: [answers, failures in a row, last probed]}, keyed by address.
+        self._profiles = OrderedDict()
+        self.dirty = False
+        if filename != None:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def load(self) -> None:
+        try:
+            with open(self.filename) as json_file:
+                self._profiles = OrderedDict(json.load(json_file))
+                json_file.close()
+        except (OSError, ValueError):
+            self._profiles = OrderedDict()
+
+    def dumps(self) -> str:
+        # Serialised on the event loop, so it can be written from another thread.
+        self.dirty = False
+        return json.dumps(self._profiles)
+
+    def write(self, text: str) -> None:
+        with open(self.filename + ".tmp", "w") as outfile:
+            outfile.write(text)
+            outfile.close()
+        os.replace(self.filename + ".tmp", self.filename)
+
+    def save(self) -> None:
+        if self.filename != None:
+            self.write(self.dumps())
+
+    def plan(self, key: str) -> tuple:
+        """Returns the protocols worth probing for an address."""
+        profile = self._profiles.get(key)
+        if profile == None:
+            return PROTOCOLS
+
+        # Only skip protocols while another one answers, otherwise the address might just be down.
+        alive = any(stats[0] > 0 and stats[1] == 0 for stats in profile.values())
+        now = time.time()
+        return tuple(
+            protocol for protocol in PROTOCOLS
+            if protocol not in profile or not alive or profile[protocol][1] < self.skip_after or now - profile[protocol][2] >= self.recheck
+        )
+
+    def record(self, key: str, result: ProbeResult, protocols: tuple) -> None:
+        profile = self._profiles.get(key)
+        if profile == None:
+            profile = self._profiles[key] = {}
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+        self._profiles.move_to_end(key)
+
+        now = time.time()
+        for protocol in protocols:
+            stats = profile.setdefault(protocol, [0, 0, now])
+            if getattr(result, protocol) != None:
+                stats[0] += 1
+                stats[1] = 0
+            else:
+                stats[1] += 1
+            stats[2] = now
+        self.dirty = True
+
+    def kind(self, key: str) -> str:
+        """A readable name for the protocols an address speaks."""
+        profile = self._profiles.get(key, {})
+        speaks = [protocol for protocol in PROTOCOLS if protocol in profile and profile[protocol][0] > 0 and profile[protocol][1] < self.skip_after]
+        if JAVA_STATUS in speaks and BEDROCK_STATUS in speaks:
+            return "Hybrid (Geyser)"
+        elif JAVA_STATUS in speaks and JAVA_QUERY in speaks:
+            return "Java + Query"
+        elif JAVA_STATUS in speaks or JAVA_QUERY in speaks:
+            return "Java"
+        elif BEDROCK_STATUS in speaks:
+            return "Bedrock"
+        return "Unknown"
+
+    def describe(self, key: str) -> str:
+        """The profile of an address, one line per protocol, for !dump."""
+        profile = self._profiles.get(key)
+        if profile == None:
+            return "No protocol profile yet"
+        lines = [f"Profile: {self.kind(key)}, probing {', '.join(self.plan(key)) or 'nothing'}"]
+        for (protocol, stats) in profile.items():
+            lines.append(f"{protocol}: {stats[0]} answers, {stats[1]} failures in a row, last probed {time.strftime('%d/%m/%Y %H:%M:%S', time.localtime(stats[2]))}")
+        return "\n".join(lines)
+
+class StatusCache:
+    """
+    Purpose:
+        A TTL and LRU bounded cache of ProbeResults, shared by every cog.
+        Concurrent misses for the same address wait on a single in-flight probe.
+    Pre-Conditions:
+        :param ttl: Seconds a probe result stays fresh.
+        :param maxsize: The maximum number of addresses kept, least recently used are evicted first.
+        :param probe: The coroutine function used to probe an address, called with timeout and protocols keywords.
+        :param health: The AddressHealth picking probe timeouts and back offs.
+        :param profiles: The ProtocolProfiles picking which protocols to probe.
+        :param warm_concurrency: Maximum concurrent reprobes of results restored from disk.
+    """
+    def __init__(self, ttl: float = CACHE_TTL, maxsize: int = CACHE_SIZE, probe=probe_server, health: AddressHealth | None = None, profiles: ProtocolProfiles | None = None, warm_concurrency: int = WARM_CONCURRENCY) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.probe = probe
+        self.health = health if health != None else AddressHealth()
+        self.profiles = profiles if profiles != None else ProtocolProfiles()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.backed_off = 0
+        self.stale = 0
+        # Results saved by the last run, {key: (time saved, ServerSnapshot.dumps())}, only decoded
+        # when first asked for. Then they're served from _stale while a probe replaces them.
+        self._warm = {}
+        self._stale = {}
+        self._revalidating = asyncio.Semaphore(warm_concurrency)
+
+    @staticmethod
+    def key(address: str) -> str:
+        return address.strip().lower()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def peek(self, address: str) -> ProbeResult | None:
+        """Returns the cached result for an address if it is still fresh, without probing."""
+        entry = self._entries.get(self.key(address))
+        if entry == None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def put(self, address: str, result: ProbeResult) -> None:
+        key = self.key(address)
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, address: str) -> None:
+        key = self.key(address)
+        self._entries.pop(key, None)
+        self._warm.pop(key, None)
+        self._stale.pop(key, None)
+
+    def export(self) -> dict:
+        """Returns {key: (time probed, ServerSnapshot.dumps())} of every result, for restore() after a restart."""
+        offset = time.time() - time.monotonic()
+        snapshots = dict(self._warm)
+        for (key, result) in self._stale.items():
+            snapshots[key] = (result.restored, result.snapshot().dumps())
+        for (key, entry) in self._entries.items():
+            snapshots[key] = (entry[0] - self.ttl + offset, entry[1].snapshot().dumps())
+        return snapshots
+
+    def restore(self, snapshots: dict, max_age: float = WARM_MAX_AGE) -> int:
+        """Keeps the snapshots from export() younger than max_age to serve stale, returns how many."""
+        now = time.time()
+        for (key, (saved, values)) in snapshots.items():
+            if now - saved <= max_age and key not in self._entries:
+                self._warm[key] = (saved, values)
+        return len(self._warm)
+
+    async def get(self, address: str, background: bool = False, stale: bool = True) -> ProbeResult:
+        """
+        Purpose:
+            Returns a fresh result for an address, probing it only on a miss.
+        Pre-Conditions:
+            :param address: The server address, with an optional port.
+            :param background: True for refreshes nobody is waiting on, which reuse the last
+                result of an address that is being backed off instead of probing it.
+            :param stale: Whether a result restored from the last run may be returned while it's
+                being reprobed, False waits for the new result.
+        Post-Conditions:
+            A miss stores the new result in the cache.
+        Return:
+            A ProbeResult for the address.
+        """
+        key = self.key(address)
+        result = self.peek(key)
+        if result != None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+        # A result restored from the last run is served at once while a probe replaces it.
+        result = self._stale.get(key)
+        if result == None and key in self._warm:
+            (saved, values) = self._warm.pop(key)
+            result = self._stale[key] = ProbeResult.restore(ServerSnapshot.loads(values), saved)
+        if result != None:
+            if key not in self._inflight:
+                self.misses += 1
+                self._inflight[key] = asyncio.ensure_future(self._revalidate(key, address))
+            if stale:
+                self.stale += 1
+                return result
+
+        if background and self.health.backing_off(key):
+            result = self.health.last_failure(key)
+            if result != None:
+                self.backed_off += 1
+                return result
+
+        task = self._inflight.get(key)
+        if task == None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch(key, address))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        # Shielded so one cancelled caller doesn't cancel the probe for the others.
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, address: str) -> ProbeResult:
+        try:
+            protocols = self.profiles.plan(key)
+            result = await self.probe(address, timeout=self.health.timeout(key), protocols=protocols)
+            self.health.record(key, result)
+            self.profiles.record(key, result, protocols)
+            self.put(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+            self._stale.pop(key, None)
+
+    async def _revalidate(self, key: str, address: str) -> ProbeResult:
+        # Every restored address is asked for at once after a restart, so their probes are bounded.
+        async with self._revalidating:
+            return await self._fetch(key, address)
+
+class IconCache:
+    """
+    Purpose:
+        Decoded server favicons kept in memory, keyed by a hash of the favicon string.
+        The least recently used icons are evicted once the byte budget is exceeded.
+    Pre-Conditions:
+        :param default_path: Path of the PNG used when a server has no usable favicon, read once here.
+        :param max_bytes: The byte budget for decoded favicons.
+    """
+    def __init__(self, default_path: str, max_bytes: int = ICON_CACHE_BYTES) -> None:
+        with open(default_path, "rb") as f:
+            self.default = f.read()
+            f.close()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._icons = OrderedDict()
+
+    @staticmethod
+    def key(server_icon: str) -> str:
+        return hashlib.blake2b(server_icon.encode(), digest_size=16).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._icons)
+
+    def get(self, server_icon: str | None) -> bytes:
+        """
+        Purpose:
+            Returns the PNG bytes of a favicon, decoding it only the first time it's seen.
+        Pre-Conditions:
+            :param server_icon: The "data:image/png;base64,..." string a server sent, or None.
+        Return:
+            The decoded PNG, or the default icon if the favicon is missing or invalid.
+        """
+        if server_icon == None or "data:image/png;base64," not in server_icon:
+            return self.default
+
+        key = self.key(server_icon)
+        icon = self._icons.get(key)
+        if icon != None:
+            self._icons.move_to_end(key)
+            return icon
+
+        try:
+            # Not validated, servers before 1.13 wrap the base64 across lines.
+            icon = base64.b64decode(server_icon.split(",")[1])
+        except:
+            return self.default
+        if icon == b"":
+            return self.default
+
+        self._icons[key] = icon
+        self.size += len(icon)
+        while self.size > self.max_bytes and len(self._icons) > 1:
+            self.size -= len(self._icons.popitem(last=False)[1])
+        return icon
+
+class WarmState:
+    """
+    Purpose:
+        The latest server snapshots, DNS answers and tracker edit fingerprints, kept in a gzipped
+        JSON file so a restarted bot serves what it last knew instead of starting cold.
+        Favicons are stored once each, however many servers share them.
+    Pre-Conditions:
+        :param filename: Path of the file.
+        :param max_age: Seconds after which a saved snapshot is too old to serve.
+    """
+    def __init__(self, filename: str, max_age: float = WARM_MAX_AGE) -> None:
+        self.filename = filename
+        self.max_age = max_age
+
+    def dumps(self, status_cache: StatusCache, resolver: Resolver, fingerprints: dict) -> dict:
+        """Collects the state to save, call from the event loop and write() it from a thread."""
+        favicon = ServerSnapshot.__slots__.index("favicon")
+        snapshots = {}
+        favicons = {}
+        for (key, (saved, values)) in status_cache.export().items():
+            values = list(values)
+            if values[favicon] != None:
+                icon = IconCache.key(values[favicon])
+                favicons[icon] = values[favicon]
+                values[favicon] = icon
+            snapshots[key] = [saved, values]
+        return {
+            "time": time.time(),
+            "slots": list(ServerSnapshot.__slots__),
+            "snapshots": snapshots,
+            "favicons": favicons,
+            "dns": resolver.export(),
+            "fingerprints": fingerprints,
+        }
+
+    def write(self, data: dict) -> None:
+        with gzip.open(self.filename + ".tmp", "wt", compresslevel=6) as warm_file:
+            json.dump(data, warm_file, separators=(",", ":"))
+            warm_file.close()
+        os.replace(self.filename + ".tmp", self.filename)
+
+    def read(self) -> dict | None:
+        try:
+            with gzip.open(self.filename, "rt") as warm_file:
+                data = json.load(warm_file)
+                warm_file.close()
+        except (OSError, ValueError, EOFError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def restore(self, data: dict, status_cache: StatusCache, resolver: Resolver) -> tuple:
+        """
+        Purpose:
+            Hands the saved snapshots and DNS answers back to the caches, snapshots stay encoded until used.
+        Pre-Conditions:
+            :param data: What read() returned.
+        Return:
+            (snapshots restored, DNS answers restored).
+        """
+        age = max(0.0, time.time() - data.get("time", 0))
+        # Snapshots saved with other fields can't be read back, they're dropped.
+        snapshots = {}
+        if data.get("slots") == list(ServerSnapshot.__slots__):
+            favicon = ServerSnapshot.__slots__.index("favicon")
+            favicons = data.get("favicons", {})
+            for (key, (saved, values)) in data.get("snapshots", {}).items():
+                if values[favicon] != None:
+                    values[favicon] = favicons.get(values[favicon])
+                snapshots[key] = (saved, values)
+        return (status_cache.restore(snapshots, self.max_age), resolver.restore(data.get("dns", []), age))
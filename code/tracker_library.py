@@ -0,0 +1,246 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Status Tracker Library
+# Purpose: Storage and scheduling for the StatusTracker cog, and saved server lists.
+# Date: 18OCTOBER2026
+#--------------------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import time
+import zlib
+from collections import namedtuple
+
+# Seconds between tracker schedule ticks, and the default refresh interval of a tracked message.
+TRACKER_TICK = 5.0
+TRACKER_INTERVAL = 60.0
+
+# interval is the message's refresh interval in seconds, None for the default.
+TrackedMessage = namedtuple("TrackedMessage", ["message_id", "channel_id", "guild_id", "address", "interval"])
+
+def parse_entry(entry: str) -> tuple:
+    # messages.json entries are "channel-message-address", older ones are just "channel-message".
+    ids = entry.split("-", 2)
+    return (int(ids[0]), int(ids[1]), ids[2] if len(ids) == 3 else None)
+
+class TrackerStore:
+    """
+    Purpose:
+        A SQLite registry of tracked messages, indexed by address, channel and guild.
+        Every change is a single-row write, nothing rewrites the whole registry.
+    Pre-Conditions:
+        :param filename: Path of the SQLite database, created if it doesn't exist.
+    """
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        # Shard processes share the registry, so wait out each other's writes instead of failing.
+        self.db = sqlite3.connect(filename, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS tracked (
+                message_id INTEGER PRIMARY KEY,
+                channel_id INTEGER NOT NULL,
+                guild_id INTEGER,
+                address TEXT,
+                created REAL NOT NULL,
+                interval REAL
+            );
+            CREATE INDEX IF NOT EXISTS tracked_address ON tracked (address);
+            CREATE INDEX IF NOT EXISTS tracked_channel ON tracked (channel_id);
+            CREATE INDEX IF NOT EXISTS tracked_guild ON tracked (guild_id);
+        """)
+        # Registries created before refresh intervals existed lack the column.
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(tracked)").fetchall()]
+        if "interval" not in columns:
+            self.db.execute("ALTER TABLE tracked ADD COLUMN interval REAL")
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _select(self, where: str = "", params: tuple = ()) -> list:
+        cursor = self.db.execute("SELECT message_id, channel_id, guild_id, address, interval FROM tracked " + where + " ORDER BY message_id", params)
+        return [TrackedMessage(*row) for row in cursor.fetchall()]
+
+    def add(self, channel_id: int, message_id: int, address: str | None, guild_id: int | None = None, interval: float | None = None) -> TrackedMessage:
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO tracked (message_id, channel_id, guild_id, address, created, interval) VALUES (?, ?, ?, ?, ?, ?)",
+                (message_id, channel_id, guild_id, address, time.time(), interval)
+            )
+        return TrackedMessage(message_id, channel_id, guild_id, address, interval)
+
+    def remove(self, message_id: int) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM tracked WHERE message_id = ?", (message_id,))
+
+    def set_address(self, message_id: int, address: str) -> None:
+        with self.db:
+            self.db.execute("UPDATE tracked SET address = ? WHERE message_id = ?", (address, message_id))
+
+    def get(self, message_id: int) -> TrackedMessage | None:
+        rows = self._select("WHERE message_id = ?", (message_id,))
+        return rows[0] if rows != [] else None
+
+    def all(self) -> list:
+        return self._select()
+
+    def by_address(self, address: str) -> list:
+        return self._select("WHERE address = ?", (address,))
+
+    def by_channel(self, channel_id: int) -> list:
+        return self._select("WHERE channel_id = ?", (channel_id,))
+
+    def by_guild(self, guild_id: int) -> list:
+        return self._select("WHERE guild_id = ?", (guild_id,))
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM tracked").fetchone()[0]
+
+    def migrate_json(self, filename: str, guild_of=None) -> int:
+        """
+        Purpose:
+            Imports a legacy messages.json into the store.
+        Pre-Conditions:
+            :param filename: Path of the messages.json file.
+            :param guild_of: Optional function mapping a channel id to its guild id, or None.
+        Post-Conditions:
+            The file is renamed to <filename>.migrated so it is only imported once.
+        Return:
+            The number of messages imported.
+        """
+        if not os.path.exists(filename):
+            return 0
+
+        with open(filename) as json_file:
+            messages = json.load(json_file)
+            json_file.close()
+
+        count = 0
+        with self.db:
+            for entry in messages.get("messages", []):
+                try:
+                    (channel_id, message_id, address) = parse_entry(entry)
+                except:
+                    continue
+                guild_id = guild_of(channel_id) if guild_of != None else None
+                self.db.execute(
+                    "INSERT OR IGNORE INTO tracked (message_id, channel_id, guild_id, address, created) VALUES (?, ?, ?, ?, ?)",
+                    (message_id, channel_id, guild_id, address, time.time())
+                )
+                count += 1
+
+        os.replace(filename, filename + ".migrated")
+        return count
+
+# The most servers a guild can save for !statusall.
+SERVER_LIST_SIZE = 25
+
+class ServerListStore:
+    """
+    Purpose:
+        Each guild's saved server list for !statusall, kept in SQLite so shard processes can share it.
+    Pre-Conditions:
+        :param filename: Path of the SQLite database, created if it doesn't exist.
+        :param maxsize: The most servers a guild can save.
+    """
+    def __init__(self, filename: str, maxsize: int = SERVER_LIST_SIZE) -> None:
+        self.maxsize = maxsize
+        self.db = sqlite3.connect(filename, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS server_list (
+                guild_id INTEGER NOT NULL,
+                address TEXT NOT NULL,
+                added REAL NOT NULL,
+                PRIMARY KEY (guild_id, address)
+            );
+        """)
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def get(self, guild_id: int) -> list:
+        cursor = self.db.execute("SELECT address FROM server_list WHERE guild_id = ? ORDER BY added, address", (guild_id,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def add(self, guild_id: int, addresses: list) -> list:
+        """Saves addresses to a guild's list, returns the ones added before it filled up."""
+        saved = self.get(guild_id)
+        added = []
+        with self.db:
+            for address in addresses:
+                if address in saved or address in added:
+                    continue
+                if len(saved) + len(added) >= self.maxsize:
+                    break
+                self.db.execute("INSERT INTO server_list (guild_id, address, added) VALUES (?, ?, ?)", (guild_id, address, time.time()))
+                added.append(address)
+        return added
+
+    def remove(self, guild_id: int, addresses: list) -> int:
+        with self.db:
+            return sum(self.db.execute("DELETE FROM server_list WHERE guild_id = ? AND address = ?", (guild_id, address)).rowcount for address in addresses)
+
+    def clear(self, guild_id: int) -> int:
+        with self.db:
+            return self.db.execute("DELETE FROM server_list WHERE guild_id = ?", (guild_id,)).rowcount
+
+class TrackerSchedule:
+    """
+    Purpose:
+        A timing wheel spreading tracked message refreshes across their interval.
+        Each interval is split into interval / tick slots, and a message is due in the slot
+        picked by a hash of its address, so messages for one address still refresh together.
+    Pre-Conditions:
+        :param tick: Seconds per slot.
+        :param default_interval: The refresh interval of messages that don't set their own.
+    """
+    def __init__(self, tick: float = TRACKER_TICK, default_interval: float = TRACKER_INTERVAL) -> None:
+        self.tick = tick
+        self.default_interval = default_interval
+        # {(slots, phase): {message_id: row}}, and each message's bucket key.
+        self._buckets = {}
+        self._keys = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        for bucket in self._buckets.values():
+            yield from bucket.values()
+
+    def slots(self, row: TrackedMessage) -> int:
+        interval = row.interval if row.interval != None else self.default_interval
+        return max(1, round(interval / self.tick))
+
+    def add(self, row: TrackedMessage) -> None:
+        self.remove(row.message_id)
+        slots = self.slots(row)
+        key = (slots, zlib.crc32((row.address or "").lower().encode()) % slots)
+        self._buckets.setdefault(key, {})[row.message_id] = row
+        self._keys[row.message_id] = key
+
+    def remove(self, message_id: int) -> None:
+        key = self._keys.pop(message_id, None)
+        if key != None:
+            bucket = self._buckets[key]
+            bucket.pop(message_id, None)
+            if bucket == {}:
+                del self._buckets[key]
+
+    def current_tick(self) -> int:
+        return int(time.time() // self.tick)
+
+    def due(self, tick: int) -> list:
+        """Returns the messages due in a tick, ticks count slots since the epoch."""
+        rows = []
+        for slots in set(key[0] for key in self._buckets):
+            rows += self._buckets.get((slots, tick % slots), {}).values()
+        return rows
+
+    def max_slots(self) -> int:
+        return max([key[0] for key in self._buckets], default=1)
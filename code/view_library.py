@@ -0,0 +1,134 @@
+#!/bin/python3
+#--------------------------------------------------------------------
+# Project: Status View Library
+# Purpose: Render ServerSnapshots as the embeds every command and the tracker send.
+# Date: 18OCTOBER2026
+#--------------------------------------------------------------------
+
+import discord
+
+import status_library as s
+
+# Embed colours, online, online with nothing to show, and unreachable.
+GREEN = 0x65bf65
+YELLOW = 0xe6d132
+RED = 0xbf0f0f
+
+# Where every embed shows the server icon sent with it.
+IMAGE = "attachment://image.png"
+
+# !statusall markers, a coloured circle per server.
+ONLINE = "\U0001f7e2"
+BEDROCK = "\U0001f7e1"
+OFFLINE = "\U0001f534"
+CHECKING = "\u26aa"
+
+# Discord's limit on an embed field's value.
+FIELD_LIMIT = 1024
+
+def embed(title: str, description: str, color: int) -> discord.Embed:
+    embed = discord.Embed(title=title, description=description, color=color)
+    embed.set_image(url=IMAGE)
+    return embed
+
+def title(address: str, snapshot: s.ServerSnapshot) -> str:
+    return f"{'Java' if snapshot.edition == 'java' else 'Bedrock'} Server: {address}"
+
+def error_embed(address: str, error_title: str = "Error:") -> discord.Embed:
+    return embed(error_title, f"Whoops, something went wrong,\ncouldn't reach {address}.\t¯\\\\_(\"/)\_/¯", RED)
+
+def players_line(snapshot: s.ServerSnapshot) -> str:
+    return f"Players: {snapshot.players_online}/{snapshot.players_max}"
+
+def version_line(snapshot: s.ServerSnapshot) -> str:
+    # Query and Bedrock report a software brand, the Java status only a version name.
+    return f"{snapshot.brand}: {snapshot.version}" if snapshot.brand != None else f"Version: {snapshot.version}"
+
+def status_embed(address: str, snapshot: s.ServerSnapshot, error_title: str = "Error:") -> discord.Embed:
+    """The !status embed, also what tracked messages show."""
+    if not snapshot.online:
+        return error_embed(address, error_title)
+    lines = [snapshot.motd]
+    if snapshot.edition == "bedrock":
+        lines.append(snapshot.map or "")
+    lines += [players_line(snapshot), version_line(snapshot)]
+    return embed(title(address, snapshot), "\n".join(lines), GREEN if snapshot.edition == "java" else YELLOW)
+
+def players_embed(address: str, snapshot: s.ServerSnapshot) -> discord.Embed:
+    if not snapshot.online:
+        return error_embed(address)
+    if not snapshot.players_online:
+        return embed(title(address, snapshot), "No players online.", YELLOW)
+    if snapshot.player_names != []:
+        return embed(title(address, snapshot), "Players:\n" + ", ".join(snapshot.player_names), GREEN)
+    return embed(title(address, snapshot), players_line(snapshot), GREEN)
+
+def plugins_embed(address: str, snapshot: s.ServerSnapshot) -> discord.Embed:
+    if not snapshot.online:
+        return error_embed(address)
+    if snapshot.plugins == []:
+        return embed(title(address, snapshot), "No plugins detected.", YELLOW)
+    return embed(title(address, snapshot), "Plugins:\n" + ", ".join(snapshot.plugins), GREEN)
+
+def mods_embed(address: str, snapshot: s.ServerSnapshot) -> discord.Embed:
+    if not snapshot.online:
+        return error_embed(address)
+    if snapshot.mods == []:
+        return embed(title(address, snapshot), "No mods detected.", YELLOW)
+    return embed(title(address, snapshot), "Mods:\n" + ", ".join(f"{modid}: v{version}" for (modid, version) in snapshot.mods), GREEN)
+
+def field(values: list) -> str:
+    # Joins values for an embed field, cut off to fit Discord's limit.
+    text = ", ".join(values) or "None"
+    return text if len(text) <= FIELD_LIMIT else text[:FIELD_LIMIT - 3] + "..."
+
+def info_embed(address: str, snapshot: s.ServerSnapshot) -> discord.Embed:
+    """The !info embed, everything a snapshot holds."""
+    if not snapshot.online:
+        return error_embed(address)
+    info = embed(title(address, snapshot), snapshot.motd, GREEN if snapshot.edition == "java" else YELLOW)
+    info.add_field(name="Players", value=f"{snapshot.players_online}/{snapshot.players_max}")
+    # Discord rejects an empty field value, and some servers send blank ones once their formatting is stripped.
+    info.add_field(name="Version", value=(version_line(snapshot) if snapshot.brand != None else snapshot.version) or "Unknown")
+    info.add_field(name="Latency", value=f"{snapshot.latency:.0f}ms" if snapshot.latency != None else "Unknown")
+    if snapshot.map:
+        info.add_field(name="Map", value=snapshot.map)
+    if snapshot.gamemode:
+        info.add_field(name="Gamemode", value=snapshot.gamemode)
+    if snapshot.protocol != None:
+        info.add_field(name="Protocol", value=str(snapshot.protocol))
+    if snapshot.edition == "java":
+        info.add_field(name="Online", value=field(snapshot.player_names), inline=False)
+        info.add_field(name="Plugins", value=field(snapshot.plugins), inline=False)
+        info.add_field(name="Mods", value=field([f"{modid}: v{version}" for (modid, version) in snapshot.mods]), inline=False)
+    return info
+
+def summary_line(address: str, snapshot: s.ServerSnapshot | None) -> str:
+    """One line of the !statusall embed, None while the server is still being checked."""
+    if snapshot == None:
+        return CHECKING + f" **{address}** checking..."
+    if not snapshot.online:
+        return OFFLINE + f" **{address}** unreachable"
+    parts = [f"{snapshot.players_online}/{snapshot.players_max} players", version_line(snapshot)]
+    if snapshot.latency != None:
+        parts.append(f"{snapshot.latency:.0f}ms")
+    return (ONLINE if snapshot.edition == "java" else BEDROCK) + f" **{address}** " + " \u00b7 ".join(parts)
+
+def summary_embed(entries: list) -> discord.Embed:
+    """
+    Purpose:
+        The !statusall embed, one line per server, sent before every server has answered.
+    Pre-Conditions:
+        :param entries: (address, ServerSnapshot or None while still being checked) pairs, in order.
+    Return:
+        The embed, without an image.
+    """
+    snapshots = [snapshot for (address, snapshot) in entries if snapshot != None]
+    online = len([snapshot for snapshot in snapshots if snapshot.online])
+    if len(snapshots) < len(entries):
+        heading = f"Servers: {online} online, {len(entries) - len(snapshots)} checking..."
+        color = YELLOW
+    else:
+        heading = f"Servers: {online}/{len(entries)} online"
+        color = GREEN if online == len(entries) else RED if online == 0 else YELLOW
+    return discord.Embed(title=heading, description="\n".join(summary_line(address, snapshot) for (address, snapshot) in entries), color=color)